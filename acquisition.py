@@ -0,0 +1,400 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import numpy as np
+from datetime import datetime
+from PySide6.QtCore import QObject, Signal, Slot
+
+import config
+import metrics
+import models
+
+logger = logging.getLogger('measuring')
+
+
+class ReadPlan:
+    """План чтения каналов кадра, скомпилированный из config.
+
+    FRMAME_ORDER разбивается на этапы: 'check' - чтение стабильных каналов
+    с проверкой, что значение не изменилось с начала кадра, и 'read' -
+    независимые каналы между проверками. Этапы выполняются строго по
+    порядку, каналы внутри этапа - параллельно, если это допускает
+    установка. Повторное чтение канала внутри этапа и повторы обычных
+    каналов в кадре исключаются.
+    """
+    def __init__(self, order=None, strict=None):
+        order = config.FRMAME_ORDER if order is None else order
+        strict = config.STRICT_STABILITY if strict is None else strict
+        stages, seen = [], set()
+        for ch in order:
+            kind = 'check' if ch in config.STABLE_CHANNELS else 'read'
+            if kind == 'read':
+                if ch in seen or not (
+                        ch in config.BASE_CHANNELS or ch in config.MV_CHANNELS):
+                    continue
+                seen.add(ch)
+            if not stages or stages[-1][0] != kind:
+                stages.append((kind, []))
+            if ch not in stages[-1][1]:
+                stages[-1][1].append(ch)
+        if not strict:
+            checks = [i for i, (kind, _) in enumerate(stages) if kind == 'check']
+            inner = set(checks[1:-1])
+            merged = []
+            for i, (kind, channels) in enumerate(stages):
+                if i in inner:
+                    continue
+                if merged and merged[-1][0] == kind == 'read':
+                    merged[-1][1].extend(channels)
+                else:
+                    merged.append((kind, channels))
+            stages = merged
+        self.stages = [(kind, tuple(channels)) for kind, channels in stages]
+        self.width = max((len(ch) for _, ch in self.stages), default=1)
+
+
+_plan = None
+_pool = None
+
+
+def read_plan():
+    global _plan
+    if _plan is None:
+        _plan = ReadPlan()
+    return _plan
+
+
+def read_channel(plant, ch):
+    if ch in config.MV_CHANNELS:  # отсчёты одного канала - последовательно
+        return [read_value(plant, ch) for _ in range(config.MV_CHANNELS[ch])]
+    return read_value(plant, ch)
+
+
+def read_value(plant, ch):
+    with metrics.span('plant.measure', ch):
+        return plant.measure(ch)
+
+
+def read_channels(plant, channels, plan):
+    """Значения каналов этапа; параллельно, если установка это допускает"""
+    global _pool
+    if len(channels) == 1 or not getattr(plant, 'concurrent_reads', False):
+        return [read_channel(plant, ch) for ch in channels]
+    if _pool is None:
+        _pool = ThreadPoolExecutor(plan.width, thread_name_prefix='plant')
+    return list(_pool.map(partial(read_channel, plant), channels))
+
+
+def measure(plant, plan=None):
+    """Снимает один кадр; None при нарушении стабильности"""
+    plan = plan or read_plan()
+    results, stable = {}, {}
+    for kind, channels in plan.stages:
+        values = read_channels(plant, channels, plan)
+        if kind == 'read':
+            results.update(zip(channels, values))
+            continue
+        for ch, m in zip(channels, values):
+            if (last := stable.get(ch, m)) != m:
+                logger.error(f'канал {ch}: нарушение стабильности ({last}->{m})')
+                return None
+            stable[ch] = m
+
+    return results
+
+
+class FrameAssembler:
+    """Сборка кадров пакетами.
+
+    Раскладка строки исходных значений строится один раз по плану чтения:
+    канал BASE_CHANNELS занимает в ней один столбец, канал MV_CHANNELS -
+    по столбцу на отсчёт. Кадры пишутся в предвыделенный двумерный массив,
+    а округление, среднее и дисперсия MV-каналов и проверка BORDERS
+    выполняются сразу для всего пакета. Столбцы значений - в порядке
+    номеров каналов: у канала BASE_CHANNELS округлённое значение, у канала
+    MV_CHANNELS - среднее и дисперсия отсчётов.
+    """
+    def __init__(self, capacity=None, plan=None):
+        plan = plan or read_plan()
+        self.capacity = capacity or config.BATCH_SIZE
+        channels = sorted({
+            ch for kind, chs in plan.stages if kind == 'read' for ch in chs})
+        self.layout = []  # (канал, начало, конец) в строке исходных значений
+        self.base = []  # (канал, столбец исходных, столбец значений)
+        self.mv = []  # (канал, начало, конец, столбец среднего)
+        width = out = 0
+        for ch in channels:
+            if ch in config.BASE_CHANNELS:
+                self.layout.append((ch, width, width + 1))
+                self.base.append((ch, width, out))
+                width, out = width + 1, out + 1
+            else:
+                n = config.MV_CHANNELS[ch]
+                self.layout.append((ch, width, width + n))
+                self.mv.append((ch, width, width + n, out))
+                width, out = width + n, out + 2
+        self.width = width
+        self.n_values = out
+        self._base_raw = [raw for _, raw, _ in self.base]
+        self._base_out = [o for _, _, o in self.base]
+        self._low = np.array([
+            config.BORDERS.get(ch, (-np.inf, np.inf))[0] for ch, _, _ in self.base])
+        self._high = np.array([
+            config.BORDERS.get(ch, (-np.inf, np.inf))[1] for ch, _, _ in self.base])
+        self.research = np.empty(self.capacity, np.int64)
+        self.times = np.empty(self.capacity)
+        self.raw = np.empty((self.capacity, width))
+        self.size = 0
+
+    def put(self, row, measurements):
+        """Раскладывает значения кадра в строку исходных значений"""
+        for ch, start, stop in self.layout:
+            row[start:stop] = measurements[ch]
+
+    def add(self, research, seconds, measurements):
+        """Добавляет кадр; True, если пакет заполнен"""
+        self.research[self.size] = research
+        self.times[self.size] = seconds
+        self.put(self.raw[self.size], measurements)
+        self.size += 1
+        return self.size == self.capacity
+
+    def values(self, raw):
+        """Значения кадров по исходным, (кадры, столбцы)"""
+        values = np.empty((len(raw), self.n_values))
+        values[:, self._base_out] = raw[:, self._base_raw].round(4)
+        for _, start, stop, out in self.mv:
+            block = raw[:, start:stop]
+            values[:, out] = block.mean(axis=1).round(4)
+            values[:, out + 1] = block.var(axis=1).round(4)
+        return values
+
+    def check_borders(self, raw):
+        """Одно предупреждение на канал о выходах за BORDERS в пакете"""
+        base = raw[:, self._base_raw]
+        outside = (base < self._low) | (base > self._high)
+        for j in np.flatnonzero(outside.any(axis=0)):
+            ch = self.base[j][0]
+            bad = base[outside[:, j], j]
+            logger.warning(
+                f'канал {ch}: {len(bad)} значений вне диапазона '
+                f'[{self._low[j]}, {self._high[j]}], от {bad.min()} до {bad.max()}')
+
+    @metrics.timed('get_frame.batch')
+    def batch(self, research, times, raw):
+        """FrameBatch для FrameWriter.add_batch по исходным значениям"""
+        self.check_borders(raw)
+        samples = {}
+        if config.STORE_MV_SAMPLES:
+            samples = {ch: raw[:, start:stop] for ch, start, stop, _ in self.mv}
+        return models.FrameBatch(research, times, self.values(raw), samples)
+
+    def take(self):
+        """FrameBatch накопленных кадров; буфер освобождается"""
+        n, self.size = self.size, 0
+        return self.batch(
+            self.research[:n].copy(), self.times[:n].copy(), self.raw[:n].copy())
+
+
+class AcquisitionWorker(QObject):
+    """Снятие n кадров вне GUI-потока с пакетной записью в БД"""
+    progress = Signal(int, int)  # снято кадров, всего
+    rows_ready = Signal(object)  # ColumnStore записанного пакета кадров
+    finished = Signal(int, int)  # эксперимент, записано кадров
+    failed = Signal(str)
+
+    def __init__(self, plant, research, n_frames, parent=None):
+        super().__init__(parent)
+        self.plant = plant
+        self.research = research
+        self.n_frames = n_frames
+        self.unstable = 0  # кадров, отброшенных из-за нарушения стабильности
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    @Slot()
+    def run(self):
+        writer = models.FrameWriter(on_flush=self.rows_ready.emit)
+        assembler = FrameAssembler(writer.batch_size)
+        try:
+            with writer:
+                for i in range(self.n_frames):
+                    if self._cancel.is_set():
+                        logger.info(
+                            f'Съёмка прервана на кадре {i} из {self.n_frames}')
+                        break
+                    with metrics.span('get_frame'):
+                        now = datetime.now().time()
+                        results = measure(self.plant)
+                        full = results is not None and assembler.add(
+                            self.research, models.entries.time_to_seconds(now),
+                            results)
+                    if results is None:
+                        self.unstable += 1
+                    elif full or writer.due():
+                        writer.add_batch(assembler.take())
+                    self.progress.emit(i + 1, self.n_frames)
+                writer.add_batch(assembler.take())
+        except Exception as e:
+            logger.exception('Ошибка при съёмке кадров')
+            self.failed.emit(str(e))
+        self.finished.emit(self.research, writer.written)
+
+
+class FrameRing:
+    """Кольцевой буфер последних кадров в предвыделенных массивах NumPy.
+
+    times - секунды от полуночи, values - строки кадров шириной width
+    (у ContinuousWorker - исходные значения в раскладке FrameAssembler).
+    Кадры, не отданные на запись, при переполнении теряются.
+    """
+    def __init__(self, capacity, width):
+        self.capacity = capacity
+        self.times = np.empty(capacity)
+        self.values = np.empty((capacity, width))
+        self.total = 0  # добавлено кадров за всё время
+        self.flushed = 0  # из них отдано на запись или потеряно
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def push(self, seconds, frame=None):
+        """Добавляет кадр; без frame возвращает строку values для заполнения"""
+        i = self.total % self.capacity
+        self.times[i] = seconds
+        self.total += 1
+        if frame is None:
+            return self.values[i]
+        self.values[i] = frame
+
+    def _since(self, start):
+        idx = np.arange(max(start, self.total - self.capacity, 0), self.total)
+        idx %= self.capacity
+        return idx
+
+    def latest(self, n):
+        """Копии времён и значений последних n кадров в порядке поступления"""
+        idx = self._since(self.total - n)
+        return self.times[idx], self.values[idx]
+
+    def take_pending(self):
+        """Кадры, ещё не отданные на запись (времена, значения), и число
+        потерянных"""
+        lost = max(0, self.total - self.capacity - self.flushed)
+        idx = self._since(self.flushed)
+        self.flushed = self.total
+        return self.times[idx], self.values[idx], lost
+
+
+class ContinuousWorker(QObject):
+    """Непрерывная съёмка с заданной частотой до отмены.
+
+    Моменты кадров отсчитываются от начала съёмки (start + k / rate), так
+    что задержки не накапливаются; если момент упущен больше чем на
+    период, кадры пропускаются до ближайшего будущего момента и
+    считаются пропущенными. Исходные значения кадров копятся в FrameRing,
+    раз в FLUSH_INTERVAL собираются FrameAssembler и записываются в БД
+    одним пакетом. С n_frames съёмка заканчивается сама через n_frames
+    моментов (n_frames / rate секунд).
+    """
+    rows_ready = Signal(object)  # ColumnStore записанного пакета кадров
+    window_ready = Signal(object, object)  # времена и значения последних кадров
+    rate_changed = Signal(float, int, int)  # частота, снято кадров, пропущено
+    finished = Signal(int, int)  # эксперимент, записано кадров
+    failed = Signal(str)
+
+    def __init__(self, plant, research, rate=None, n_frames=None, parent=None):
+        super().__init__(parent)
+        self.plant = plant
+        self.research = research
+        self.rate = rate or config.CONTINUOUS['rate']
+        self.n_frames = n_frames
+        self.assembler = FrameAssembler(1)
+        self.ring = FrameRing(config.CONTINUOUS['ring_size'], self.assembler.width)
+        self.missed = 0
+        self.lost = 0
+        self.unstable = 0
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    @Slot()
+    def run(self):
+        writer = models.FrameWriter(flush_interval=math.inf, on_flush=self.rows_ready.emit)
+        period = 1 / self.rate
+        ui_interval = config.CONTINUOUS['ui_interval']
+        start = time.monotonic()
+        next_flush = start + config.FLUSH_INTERVAL
+        next_report = start + ui_interval
+        frame_no = 0
+        try:
+            while not self._cancel.is_set():
+                if self.n_frames is not None and frame_no >= self.n_frames:
+                    break
+                now = time.monotonic()
+                deadline = start + frame_no * period
+                if now - deadline > period:
+                    late = math.floor((now - start) / period)
+                    if self.n_frames is not None:
+                        late = min(late, self.n_frames)
+                    self.missed += late - frame_no
+                    frame_no = late
+                    continue
+                if now < deadline and self._cancel.wait(deadline - now):
+                    break
+                frame_no += 1
+                self._acquire()
+                now = time.monotonic()
+                if now >= next_flush:
+                    next_flush = now + config.FLUSH_INTERVAL
+                    self._flush(writer)
+                if now >= next_report:
+                    next_report = now + ui_interval
+                    self._report(now - start)
+            self._flush(writer)
+            self._report(time.monotonic() - start)
+        except Exception as e:
+            logger.exception('Ошибка при непрерывной съёмке')
+            self.failed.emit(str(e))
+        if self.missed or self.lost:
+            logger.warning(
+                f'Непрерывная съёмка: пропущено моментов {self.missed}, '
+                f'потеряно кадров {self.lost}')
+        self.finished.emit(self.research, writer.written)
+
+    @metrics.timed('get_frame')
+    def _acquire(self):
+        now = datetime.now().time()
+        results = measure(self.plant)
+        if results is None:
+            self.unstable += 1
+        else:
+            self.assembler.put(
+                self.ring.push(models.entries.time_to_seconds(now)), results)
+
+    def _flush(self, writer):
+        times, raw, lost = self.ring.take_pending()
+        if lost:
+            self.lost += lost
+            logger.warning(f'Буфер кадров переполнен, потеряно {lost} кадров')
+        research = np.full(len(times), self.research, np.int64)
+        writer.add_batch(self.assembler.batch(research, times, raw))
+        writer.flush()
+
+    def _report(self, elapsed):
+        times, raw = self.ring.latest(config.CONTINUOUS['window'])
+        self.window_ready.emit(times, self.assembler.values(raw))
+        rate = self.ring.total / elapsed if elapsed else 0.0
+        self.rate_changed.emit(rate, self.ring.total, self.missed)
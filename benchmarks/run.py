@@ -0,0 +1,276 @@
+"""Замеры горячих путей на синтетических БД.
+
+Запуск из корня проекта:
+
+    python benchmarks/run.py                       # 10k, 100k и 1M кадров
+    python benchmarks/run.py --sizes 10000 --repeat 5
+    python benchmarks/run.py --compare benchmarks/results/old.json
+
+Каждый размер БД замеряется в отдельном процессе (models.init_db
+привязывает движок к одной БД на процесс), Qt работает с платформой
+offscreen, кадры снимаются с имитатора установки. Холодный запуск main.py
+замеряется в отдельных процессах на той же БД: startup.<фаза> -
+длительности фаз, как в metrics из main.report(), startup_at.shown - с от
+старта процесса до показа окна. Результаты сохраняются в JSON в
+benchmarks/results (в git не попадают).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS = ROOT / 'benchmarks' / 'results'
+SIZES = (10_000, 100_000, 1_000_000)
+N_RESEARCHES = 50
+
+
+def summary(runs):
+    return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+
+def timed(fn, repeat):
+    """Минимум и медиана времени выполнения fn, с"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return summary(runs)
+
+
+def fill_database(db_file, size):
+    """Синтетическая БД: N_RESEARCHES экспериментов и size кадров"""
+    import sqlite3
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    conn = sqlite3.connect(db_file)
+    conn.executemany(
+        'INSERT INTO users (research, date, user, comment) VALUES (?, ?, ?, ?)',
+        [(i + 1, f'2025-01-{i % 28 + 1:02d}', f'user{i % 7}', 'benchmark')
+         for i in range(N_RESEARCHES)])
+    seconds = np.sort(rng.uniform(0, 86400, size))
+    values = rng.normal(15, 5, (size, 10)).round(4)
+    research = np.sort(rng.integers(1, N_RESEARCHES + 1, size))
+    rows = (
+        (int(r), f'{int(s) // 3600:02d}:{int(s) // 60 % 60:02d}:{s % 60:09.6f}', *v)
+        for r, s, v in zip(research, seconds, values.tolist()))
+    conn.executemany(
+        'INSERT INTO entries (research, time, temperature, pressure, humidity, '
+        'sensor4, sensor5, sensor6_mean, sensor6_var, observation20, '
+        'observation43, observation58) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        rows)
+    conn.commit()
+    conn.close()
+
+
+def startup_phases():
+    """Холодный запуск главного окна до открытия БД; выполняется в
+    отдельном процессе, чтобы модули не были уже импортированы"""
+    sys.path.insert(0, str(ROOT))
+    from PySide6.QtCore import QTimer
+    import main
+
+    app, window = main.start([])
+    QTimer.singleShot(0, app.quit)  # после открытия БД
+    app.exec()
+    window.close_all()
+    result = {f'startup.{name}': seconds
+              for name, seconds in main.durations().items()}
+    result['startup_at.shown'] = dict(main.PHASES)['shown']
+    return result
+
+
+def bench_startup(repeat):
+    runs = [
+        json.loads(subprocess.run(
+            [sys.executable, __file__, '--startup'],
+            check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+        for _ in range(repeat)]
+    return {name: summary([run[name] for run in runs]) for name in runs[0]}
+
+
+def bench_size(size, repeat, frames):
+    """Замеры на одной БД; выполняется в дочернем процессе"""
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    os.environ['TTPOSU_PLANT'] = 'simulator'
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['APPDATA'] = tmp.name
+    sys.path.insert(0, str(ROOT))
+
+    from PySide6.QtCore import Qt
+    from PySide6.QtWidgets import QApplication, QComboBox
+    app = QApplication([])
+
+    import config
+    config.SIMULATOR = dict(config.SIMULATOR, latency=0.0)
+    import models
+    import export
+    import main_w
+    from acquisition import AcquisitionWorker
+
+    models.init_db()
+    fill_database(models.db_path, size)
+    with models.Session.begin() as session:
+        models.stats.rebuild(session)
+    results = bench_startup(repeat)
+
+    window = main_w.MainWindow()
+    window.open_database()
+
+    def load_entries():
+        # тот же путь, что при первом показе вкладки: чтение страницы
+        # (в приложении - в потоке Loader) и вставка в GUI-потоке
+        window.create_entry_models()
+        window.entries_loaded(window.read_entries())
+    results['load_entries'] = timed(load_entries, repeat)
+    results['load_entries_read'] = timed(window.read_entries, repeat)
+    results['load_users'] = timed(window.load_users, repeat)
+
+    def load_all():
+        model = models.entries.DataTableModel()
+        model.fetch_all()
+        return model
+    results['load_entries_all'] = timed(load_all, repeat)
+
+    model = load_all()
+    proxy = models.FilterProxyModel(models.entries.COLUMNS)
+    proxy.setSourceModel(model)
+    stats = models.entries.EntryStatsModel()
+    stats.setProxyModel(proxy)
+    stats.setStatsColumns(
+        list(range(3, len(models.entries.COLUMNS))), models.entries.HEADERS)
+
+    def refilter_combo():
+        proxy.set_combo_filter('research', '7')
+        proxy.set_combo_filter('research', '')
+    results['filter_combo'] = timed(refilter_combo, repeat)
+
+    def refilter_range():
+        proxy.set_range_filter(3, '10', '20')
+        proxy.set_range_filter(2, '06:00:00', '18:00:00')
+        proxy.range_filters.clear()
+        proxy.invalidateFilter()
+    results['filter_range'] = timed(refilter_range, repeat)
+
+    proxy.set_range_filter(3, '10', '20')
+    results['update_stats'] = timed(stats.updateStats, repeat)
+    proxy.set_range_filter(3, None, None)
+
+    def sort_columns():
+        proxy.sort(4, Qt.AscendingOrder)
+        proxy.sort(2, Qt.DescendingOrder)
+        proxy.sort(-1)
+    results['sort'] = timed(sort_columns, repeat)
+
+    def fill_combos():
+        distinct = models.DistinctValues()
+        for column in ('research', 'user', 'comment'):
+            main_w.fill_cmb(QComboBox(), column, distinct)
+    results['fill_cmb'] = timed(fill_combos, repeat)
+
+    def ingest():
+        with models.Session(expire_on_commit=False) as session:
+            user = models.users.User(
+                date=datetime.now().date(), user='bench', comment='')
+            session.add(user)
+            session.commit()
+        AcquisitionWorker(window.plant, user.research, frames).run()
+    results[f'get_frame_{frames}'] = timed(ingest, repeat)
+
+    for ext in ('.xlsx', '.csv', '.npz'):
+        if ext == '.xlsx' and size > 100_000:
+            continue  # Excel ограничен ~1M строк и слишком медленный для замеров
+        path = os.path.join(tmp.name, f'export{ext}')
+        tables = [
+            export.ExportTable(
+                name, name, module.HEADERS, module.COLUMNS,
+                src.sourceModel().kinds, export.selection(src))
+            for name, module, src in (
+                ('users', models.users, window.user_proxy_model),
+                ('entries', models.entries, proxy))]
+        results[f'save_view{ext}'] = timed(
+            export.ExportWorker(path, tables).run, repeat)
+
+    window.close_all()
+    del app
+    return results
+
+
+def environment():
+    def git_commit():
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+    }
+
+
+def compare(current, baseline_file):
+    baseline = json.loads(Path(baseline_file).read_text(encoding='utf-8'))
+    for size, results in current['results'].items():
+        base = baseline['results'].get(size, {})
+        for name, result in results.items():
+            if name in base:
+                ratio = result['median'] / base[name]['median']
+                print(f'{size:>8} {name:<24} {result["median"]:9.4f} с  x{ratio:.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--frames', type=int, default=1000,
+                        help='кадров в замере get_frame')
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--compare', type=Path,
+                        help='файл прошлых результатов для сравнения')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--startup', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup:
+        json.dump(startup_phases(), sys.stdout)
+        return
+    if args.child:
+        results = bench_size(args.child, args.repeat, args.frames)
+        json.dump(results, sys.stdout)
+        return
+
+    report = {'environment': environment(), 'results': {}}
+    for size in args.sizes:
+        print(f'БД на {size} кадров...', file=sys.stderr)
+        out = subprocess.run(
+            [sys.executable, __file__, '--child', str(size),
+             '--repeat', str(args.repeat), '--frames', str(args.frames)],
+            check=True, capture_output=True, text=True).stdout
+        report['results'][str(size)] = json.loads(out.splitlines()[-1])
+        for name, result in report['results'][str(size)].items():
+            print(f'{size:>8} {name:<24} {result["median"]:9.4f} с', file=sys.stderr)
+
+    output = args.output or RESULTS / f'{datetime.now():%Y%m%d-%H%M%S}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f'Результаты сохранены в {output}', file=sys.stderr)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,4 +8,59 @@ BORDERS = {
     1: (-21, 25),
     3: (50, 98),
     4: (0, 1),
-}
\ No newline at end of file
+}
+
+# Пакетная запись кадров в БД
+BATCH_SIZE = 200  # кадров в одной транзакции
+FLUSH_INTERVAL = 2.0  # с, максимальная задержка записи неполного пакета
+PAGE_SIZE = 5000  # строк, подгружаемых в таблицу за один раз
+RESIZE_ROWS = 100  # строк, по которым подбирается ширина столбцов таблицы
+
+# Применение фильтров
+FILTER_DELAY = 300  # мс без правок перед перефильтрацией
+FILTER_CHUNK = 200_000  # строк за шаг перефильтрации
+
+# Проверка стабильности во всех точках FRMAME_ORDER; иначе только в начале
+# и в конце кадра, а остальные каналы читаются одной параллельной группой
+STRICT_STABILITY = True
+
+# Установка: 'hardware' (модуль plantm) или 'simulator'.
+# Переменная окружения TTPOSU_PLANT имеет приоритет.
+PLANT_BACKEND = 'hardware'
+SIMULATOR = {
+    'latency': 0.002,  # с на одно чтение канала
+    'noise': 0.05,  # СКО шума в долях диапазона канала
+    'drift': 0.0,  # смещение в долях диапазона в секунду
+    'excursion_rate': 0.0,  # вероятность выхода значения за BORDERS
+    'stability_fault_rate': 0.0,  # вероятность скачка стабильного канала
+    'seed': None,
+}
+
+# Замеры времени горячих участков (модуль metrics).
+# Переменная окружения TTPOSU_METRICS включает их без правки config.
+METRICS = False
+METRICS_SAMPLES = 10_000  # последних замеров на участок для p50/p95
+METRICS_FILE = None  # JSON со сводкой при выходе, если задан
+
+# Панель журнала
+LOG_FLUSH_INTERVAL = 100  # мс между выводами накопленных записей
+LOG_MAX_LINES = 10_000  # строк в панели, старые вытесняются
+LOG_FILE = None  # полный журнал с ротацией, если задан путь
+LOG_FILE_BYTES = 10_000_000
+LOG_FILE_BACKUPS = 5
+
+# Непрерывная съёмка
+CONTINUOUS = {
+    'rate': 10.0,  # кадров в секунду
+    'ring_size': 10_000,  # кадров в кольцевом буфере
+    'window': 200,  # последних кадров в живой таблице
+    'ui_interval': 0.25,  # с между обновлениями таблицы и частоты
+}
+
+# Исходные отсчёты каналов MV_CHANNELS (таблица mv_samples)
+STORE_MV_SAMPLES = True
+MV_SAMPLE_DTYPE = 'float64'  # или 'float32' - вдвое компактнее
+
+# Запуск: цель по времени от старта процесса до показа главного окна.
+# Фазы запуска пишутся в журнал и в metrics (участки startup.*).
+STARTUP_TARGET = 1.0  # с
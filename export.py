@@ -0,0 +1,395 @@
+import csv
+import logging
+import os
+import tempfile
+import threading
+import zipfile
+from collections import namedtuple
+from datetime import date
+from importlib.util import find_spec
+from pathlib import Path
+import numpy as np
+from sqlalchemy import select, func
+from PySide6.QtCore import QObject, Signal, Slot
+
+import metrics
+import models
+from models.entries import seconds_to_time
+
+logger = logging.getLogger('measuring')
+
+CHUNK_SIZE = 10_000  # строк за шаг выгрузки в Excel
+BULK_CHUNK_SIZE = 200_000  # строк за шаг выгрузки в CSV, Parquet и NPZ
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# name - имя таблицы в именах файлов и массивов, title - лист Excel
+ExportTable = namedtuple(
+    'ExportTable', 'name title headers columns kinds rows')
+
+
+class ArraySelection:
+    """Отфильтрованные строки полностью загруженной модели (сырые столбцы)"""
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def count(self):
+        return len(self.rows)
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        for start in range(0, len(self.rows), chunk_size):
+            rows = self.rows[start:start + chunk_size]
+            yield [column[rows] for column in self.columns]
+
+
+class SqlSelection:
+    """Выборка модели, загруженной не целиком: читается из БД потоком"""
+    def __init__(self, stmt, n_columns):
+        self.stmt = stmt
+        self.n_columns = n_columns
+
+    def count(self):
+        with models.Session() as session:
+            return session.execute(
+                select(func.count()).select_from(self.stmt.subquery())).scalar()
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        with models.Session() as session:
+            result = session.execute(self.stmt, execution_options={
+                'stream_results': True, 'yield_per': chunk_size})
+            for part in result.partitions():
+                yield [np.asarray(column) for column in zip(*part)]
+
+
+def selection(proxy):
+    """Снимок выборки прокси, который можно выгружать из другого потока"""
+    source = proxy.sourceModel()
+    if source.canFetchMore():  # фильтры уже перенесены в запрос модели
+        return SqlSelection(source.raw_select(), source.columnCount())
+    return ArraySelection(
+        [source.raw(c) for c in range(source.columnCount())],
+        proxy.source_rows().copy())
+
+
+def python_values(kind, column):
+    """Значения столбца для записи в файл, без потери точности"""
+    if kind == 'time':
+        return [seconds_to_time(v) for v in column]
+    if kind == 'date':
+        return [date.fromordinal(v) for v in column.tolist()]
+    return column.tolist()
+
+
+POW10 = 10 ** np.arange(19, dtype=np.int64)
+
+# Текст CSV собирается из частей: часть - (символы (n, w) uint8, длины (n,),
+# выравнивание), где у строки i значимы length[i] символов справа (или
+# слева при left=True). Ячейка может состоять из нескольких частей, пустые
+# части имеют длину 0. Нулевой байт в тексте не встречается.
+TextPart = namedtuple('TextPart', 'chars lengths left', defaults=[False])
+
+
+def _const(text, n):
+    """Одинаковый текст text (bytes) в n строках"""
+    return TextPart(
+        np.broadcast_to(np.frombuffer(text, np.uint8), (n, len(text))),
+        np.full(n, len(text), np.int64))
+
+
+def _digits(values, width=1):
+    """Десятичная запись неотрицательных целых; короче width дополняются
+    нулями слева"""
+    values = np.asarray(values, np.int64)
+    lengths = np.maximum(1 + np.searchsorted(POW10[1:], values, 'right'), width)
+    w = int(lengths.max()) if len(values) else 1
+    chars = (values[:, None] // POW10[w - 1::-1] % 10 + 48).astype(np.uint8)
+    return TextPart(chars, lengths)
+
+
+def _sign(values):
+    """Минус у отрицательных values"""
+    return TextPart(
+        np.full((len(values), 1), ord('-'), np.uint8),
+        np.signbit(values).astype(np.int64))
+
+
+def _float_parts(column):
+    """Кратчайшая десятичная запись, точно восстанавливающая значение.
+
+    Для каждого числа подбирается наименьшее число знаков после точки p,
+    при котором rint(|x| * 10**p) / 10**p == |x|; мантисса до 2**53
+    гарантирует, что float() прочтёт запись обратно в то же число.
+    Остальные (nan, inf, очень большие и малые) форматирует NumPy.
+    """
+    n = len(column)
+    magnitude = np.abs(column)
+    precision = np.zeros(n, np.int64)
+    todo = np.flatnonzero(np.isfinite(column) & (magnitude < 1e15))
+    with np.errstate(over='ignore', invalid='ignore'):
+        for p in range(1, 16):
+            if not len(todo):
+                break
+            scaled = np.rint(magnitude[todo] * 10.0 ** p)
+            ok = (scaled < 2 ** 53) & (scaled / 10.0 ** p == magnitude[todo])
+            precision[todo[ok]] = p
+            todo = todo[~ok]
+    found = precision > 0
+    scaled = np.rint(
+        np.where(found, magnitude, 0) * 10.0 ** precision).astype(np.int64)
+    whole = _digits(scaled // POW10[precision])
+    fraction = _digits(scaled % POW10[precision], precision)
+    parts = [
+        _sign(np.where(found, column, 0)),
+        whole._replace(lengths=whole.lengths * found),
+        _const(b'.', n)._replace(lengths=found.astype(np.int64)),
+        fraction._replace(lengths=fraction.lengths * found)]
+    if not found.all():
+        rest = column.astype('S32')
+        rest[found] = b''
+        parts.append(TextPart(
+            rest.view(np.uint8).reshape(n, 32), np.strings.str_len(rest), True))
+    return parts
+
+
+def text_parts(kind, column):
+    """Части текста CSV ячеек числового столбца.
+
+    Запись собирается из цифр средствами NumPy, без объекта Python на
+    ячейку; дробные числа - в кратчайшей записи, как у repr.
+    """
+    n = len(column)
+    if kind == 'time':  # ЧЧ:ММ:СС.ffffff
+        us = np.round(column * 1e6).astype(np.int64)
+        seconds, us = np.divmod(us, 1_000_000)
+        return [
+            _digits(seconds // 3600, 2), _const(b':', n),
+            _digits(seconds // 60 % 60, 2), _const(b':', n),
+            _digits(seconds % 60, 2), _const(b'.', n), _digits(us, 6)]
+    if kind == 'date':
+        text = np.datetime_as_string(
+            (column - EPOCH_ORDINAL).astype('datetime64[D]')).astype('S10')
+        return [TextPart(text.view(np.uint8).reshape(n, 10), np.full(n, 10, np.int64))]
+    if kind == 'int':
+        return [_sign(column), _digits(np.abs(column))]
+    return _float_parts(np.asarray(column, np.float64))
+
+
+def join_text(parts):
+    """Склеивает части построчно в один массив байтов: каждая часть
+    занимает в строке матрицы свою полосу, незначимые символы обнуляются
+    и выбрасываются одним отбором"""
+    n = len(parts[0].lengths)
+    matrix = np.zeros((n, sum(part.chars.shape[1] for part in parts)), np.uint8)
+    start = 0
+    for chars, length, left in parts:
+        w = chars.shape[1]
+        cols = np.arange(w)
+        if left:
+            mask = cols < length[:, None]
+        else:
+            mask = cols >= (w - length)[:, None]
+        np.copyto(matrix[:, start:start + w], chars, where=mask)
+        start += w
+    return matrix[matrix != 0]
+
+
+def table_path(path, table):
+    """Файл таблицы для форматов, где каждая таблица пишется отдельно"""
+    path = Path(path)
+    return path.with_name(f'{path.stem}_{table.name}{path.suffix}')
+
+
+def formats():
+    """Поддерживаемые форматы: расширение -> описание для диалога"""
+    result = {
+        '.xlsx': 'Excel Files (*.xlsx)',
+        '.csv': 'CSV (*.csv)',
+        '.npz': 'NumPy (*.npz)',
+    }
+    if find_spec('pyarrow') is not None:
+        result['.parquet'] = 'Parquet (*.parquet)'
+    return result
+
+
+class ExportWorker(QObject):
+    """Выгрузка выборки вне GUI-потока.
+
+    tables - список ExportTable; формат определяется расширением файла.
+    """
+    progress = Signal(int, int)  # выгружено строк, всего
+    finished = Signal(str, bool)  # путь, успешно
+    failed = Signal(str)
+
+    def __init__(self, path, tables, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.tables = tables
+        self._cancel = threading.Event()
+        self._written = 0
+        self._total = 0
+
+    def cancel(self):
+        self._cancel.set()
+
+    @Slot()
+    def run(self):
+        writers = {
+            '.xlsx': self.write_xlsx,
+            '.xls': self.write_xlsx,
+            '.csv': self.write_csv,
+            '.parquet': self.write_parquet,
+            '.npz': self.write_npz,
+        }
+        try:
+            suffix = Path(self.path).suffix.lower()
+            writer = writers.get(suffix, self.write_xlsx)
+            with metrics.span('export', suffix or '.xlsx'):
+                self._total = sum(table.rows.count() for table in self.tables)
+                done = writer()
+        except Exception as e:
+            logger.exception(f'Ошибка сохранения в файл {self.path}')
+            self.failed.emit(str(e))
+            done = False
+        self.finished.emit(self.path, done)
+
+    def _chunks(self, table, chunk_size=BULK_CHUNK_SIZE):
+        """Порции столбцов таблицы с учётом отмены и прогресса"""
+        for chunk in table.rows.chunks(chunk_size):
+            if self._cancel.is_set():
+                logger.info(f'Сохранение в файл {self.path} отменено')
+                raise Cancelled
+            yield chunk
+            self._written += len(chunk[0])
+            self.progress.emit(self._written, self._total)
+
+    def write_xlsx(self):
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        try:
+            for i, table in enumerate(self.tables):
+                ws = wb.create_sheet(table.title, i)
+                ws.append(table.headers)
+                for chunk in self._chunks(table, CHUNK_SIZE):
+                    values = [
+                        python_values(k, c) for k, c in zip(table.kinds, chunk)]
+                    for line in zip(*values):
+                        ws.append(line)
+        except Cancelled:
+            return False
+        wb.save(self.path)
+        return True
+
+    def write_csv(self):
+        try:
+            for table in self.tables:
+                with open(table_path(self.path, table), 'w', newline='',
+                          encoding='utf-8') as f:
+                    f.write(','.join(table.columns) + '\n')
+                    if 'str' in table.kinds:
+                        writer = csv.writer(f)
+                        for chunk in self._chunks(table):
+                            writer.writerows(zip(*(
+                                python_values(k, c)
+                                for k, c in zip(table.kinds, chunk))))
+                        continue
+                    # Только числовые столбцы: строки собираются по столбцам
+                    for chunk in self._chunks(table):
+                        n = len(chunk[0])
+                        parts = []
+                        for kind, column in zip(table.kinds, chunk):
+                            parts += [*text_parts(kind, column), _const(b',', n)]
+                        parts[-1] = _const(b'\n', n)
+                        f.write(join_text(parts).tobytes().decode('ascii'))
+        except Cancelled:
+            return False
+        return True
+
+    def write_parquet(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError('Для выгрузки в Parquet нужен пакет pyarrow')
+
+        def arrow(kind, column):
+            if kind == 'time':
+                return pa.array(
+                    np.round(column * 1e6).astype(np.int64), pa.time64('us'))
+            if kind == 'date':
+                return pa.array(
+                    (column - EPOCH_ORDINAL).astype(np.int32), pa.date32())
+            if kind == 'str':
+                return pa.array(column, pa.string())
+            return pa.array(column)
+
+        try:
+            for table in self.tables:
+                writer = None
+                try:
+                    for chunk in self._chunks(table):
+                        batch = pa.table(
+                            [arrow(k, c) for k, c in zip(table.kinds, chunk)],
+                            names=table.columns)
+                        if writer is None:
+                            writer = pq.ParquetWriter(
+                                table_path(self.path, table), batch.schema)
+                        writer.write_table(batch)
+                finally:
+                    if writer is not None:
+                        writer.close()
+        except Cancelled:
+            return False
+        return True
+
+    def write_npz(self):
+        """Массивы <таблица>_<столбец>; время - секунды от полуночи, дата - datetime64[D]"""
+        try:
+            with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(
+                    self.path, 'w', zipfile.ZIP_STORED, allowZip64=True) as npz:
+                for table in self.tables:
+                    for file in self._npy_files(table, tmp):
+                        npz.write(file, os.path.basename(file))
+        except Cancelled:
+            os.remove(self.path)
+            return False
+        return True
+
+    def _npy_files(self, table, tmp):
+        """Пишет столбцы таблицы во временные .npy через memmap, чтобы
+        память не зависела от размера выборки"""
+        n = table.rows.count()
+        files = [os.path.join(tmp, f'{table.name}_{c}.npy') for c in table.columns]
+        arrays = []
+        for kind, file in zip(table.kinds, files):
+            if kind == 'str':
+                arrays.append([])
+                continue
+            dtype = {'int': np.int64, 'date': 'datetime64[D]'}.get(kind, np.float64)
+            arrays.append(np.lib.format.open_memmap(
+                file, 'w+', dtype=dtype, shape=(n,)))
+        try:
+            start = 0
+            for chunk in self._chunks(table):
+                stop = start + len(chunk[0])
+                for kind, array, column in zip(table.kinds, arrays, chunk):
+                    if kind == 'str':
+                        array.extend(column.tolist())
+                    elif kind == 'date':
+                        array[start:stop] = (column - EPOCH_ORDINAL).astype(
+                            'datetime64[D]')
+                    else:
+                        array[start:stop] = column
+                start = stop
+            for kind, array, file in zip(table.kinds, arrays, files):
+                if kind == 'str':
+                    np.save(file, np.array([v or '' for v in array], dtype=str))
+                else:
+                    array.flush()
+        finally:
+            arrays.clear()  # закрывает memmap до записи в архив и удаления
+        return files
+
+
+class Cancelled(Exception):
+    """Выгрузка отменена пользователем"""
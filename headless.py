@@ -0,0 +1,170 @@
+"""Съёмка без интерфейса, в ту же БД, что и у main.py.
+
+    python headless.py --user Иванов --frames 1000 --comment "ночной прогон"
+    python headless.py --user Иванов --rate 10 --frames 36000  # час, 10 кадров/с
+    python headless.py --user Иванов --rate 10                 # до Ctrl+C
+    python headless.py --user Иванов --frames 500 --output run.csv
+
+Без --rate кадры снимаются подряд (AcquisitionWorker), с --rate - по
+расписанию (ContinuousWorker). Ctrl+C останавливает съёмку, снятое
+записывается. По завершении печатаются скорость съёмки, число нарушений
+стабильности и выходов за config.BORDERS; --output выгружает эксперимент
+в файл любого формата export.
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+import numpy as np
+from PySide6.QtCore import Qt
+
+import config
+import metrics
+import models
+import plants
+from acquisition import AcquisitionWorker, ContinuousWorker, FrameAssembler
+
+logger = logging.getLogger('measuring')
+
+
+class BorderStats:
+    """Выходы за config.BORDERS по каналам в записанных (округлённых) кадрах"""
+    def __init__(self):
+        base = FrameAssembler(1).base
+        self.channels = [ch for ch, _, _ in base if ch in config.BORDERS]
+        self.columns = [
+            models.entries.COLUMNS[3 + out] for ch, _, out in base
+            if ch in config.BORDERS]
+        self.frames = 0
+        self.outside = np.zeros(len(self.channels), np.int64)
+        self.low = np.full(len(self.channels), np.inf)
+        self.high = np.full(len(self.channels), -np.inf)
+
+    def add(self, rows):
+        """Учитывает пакет кадров (ColumnStore из FrameWriter)"""
+        if not len(rows):
+            return
+        self.frames += len(rows)
+        for i, (ch, name) in enumerate(zip(self.channels, self.columns)):
+            values = rows.column(name)
+            low, high = config.BORDERS[ch]
+            self.outside[i] += np.count_nonzero((values < low) | (values > high))
+            self.low[i] = min(self.low[i], values.min())
+            self.high[i] = max(self.high[i], values.max())
+
+    def lines(self):
+        for i, ch in enumerate(self.channels):
+            low, high = config.BORDERS[ch]
+            line = f'  канал {ch} [{low}, {high}]: вне диапазона {self.outside[i]}'
+            if self.frames:
+                line += f' из {self.frames}, значения от {self.low[i]} до {self.high[i]}'
+            yield line
+
+
+def run_worker(worker):
+    """Выполняет исполнителя съёмки в отдельном потоке; Ctrl+C отменяет
+    съёмку, а уже снятые кадры записываются"""
+    done = threading.Event()
+    worker.finished.connect(done.set, Qt.DirectConnection)
+    thread = threading.Thread(target=worker.run, name='acquisition')
+    thread.start()
+    while not done.is_set():
+        try:
+            # не thread.join: прерванный Ctrl+C join портит состояние потока
+            done.wait(0.5)
+        except KeyboardInterrupt:
+            logger.info('Остановка съёмки по Ctrl+C')
+            worker.cancel()
+    thread.join()
+
+
+def export_research(path, research):
+    """Выгружает эксперимент и его кадры в файл; True при успехе"""
+    import export
+
+    tables = []
+    for name, title, module, model in (
+            ('users', 'Пользователи', models.users, models.users.UserTableModel(
+                [], [models.users.User.research == research])),
+            ('entries', 'Записи', models.entries, models.entries.DataTableModel(
+                where=[models.entries.Entries.research == research], fetch=False))):
+        tables.append(export.ExportTable(
+            name, title, module.HEADERS, module.COLUMNS, model.kinds,
+            export.SqlSelection(model.raw_select(), model.columnCount())))
+    result = []
+    worker = export.ExportWorker(path, tables)
+    worker.finished.connect(lambda path, done: result.append(done))
+    worker.run()
+    return bool(result and result[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='\n'.join(__doc__.splitlines()[2:]))
+    parser.add_argument('--user', required=True, help='ФИО')
+    parser.add_argument('--frames', type=int,
+                        help='кадров; с --rate - моментов съёмки')
+    parser.add_argument('--comment', default='', help='комментарий к эксперименту')
+    parser.add_argument('--rate', type=float,
+                        help='частота, кадров/с: съёмка по расписанию')
+    parser.add_argument('--output', help='выгрузить эксперимент в файл (.xlsx, .csv, .npz, ...)')
+    parser.add_argument('--plant', choices=plants.BACKENDS,
+                        help='установка (по умолчанию TTPOSU_PLANT или config)')
+    parser.add_argument('--db', help='файл БД вместо %%APPDATA%%/TTPOSU/database.db')
+    parser.add_argument('-v', '--verbose', action='store_true', help='отладочный журнал')
+    args = parser.parse_args()
+    if args.rate is None and args.frames is None:
+        parser.error('нужно --frames или --rate')
+    if args.frames is not None and args.frames <= 0:
+        parser.error('--frames должно быть больше нуля')
+    if args.rate is not None and args.rate <= 0:
+        parser.error('--rate должна быть больше нуля')
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+
+    models.init_db(args.db)
+    plant = plants.create_plant(args.plant)
+    research = models.users.create_research(args.user, args.comment).research
+    if args.rate is None:
+        worker = AcquisitionWorker(plant, research, args.frames)
+    else:
+        worker = ContinuousWorker(plant, research, args.rate, args.frames)
+    borders = BorderStats()
+    # событийного цикла нет: пакеты учитываются прямо в потоке съёмки
+    worker.rows_ready.connect(borders.add, Qt.DirectConnection)
+    mode = 'подряд' if args.rate is None else f'с частотой {worker.rate:g} кадров/с'
+    logger.info(f'Эксперимент {research}: съёмка {mode}')
+
+    start = time.perf_counter()
+    run_worker(worker)
+    elapsed = time.perf_counter() - start
+
+    written = borders.frames
+    attempted = written + worker.unstable
+    print(f'Эксперимент {research}: записано {written} кадров за {elapsed:.2f} с '
+          f'({written / elapsed if elapsed else 0:.1f} кадров/с)')
+    print(f'Нарушений стабильности: {worker.unstable}'
+          + (f' ({worker.unstable / attempted:.1%} кадров)' if attempted else ''))
+    if args.rate is not None:
+        print(f'Пропущено моментов: {worker.missed}, потеряно кадров: {worker.lost}')
+    print('Выходы за BORDERS:')
+    for line in borders.lines():
+        print(line)
+
+    if metrics.enabled():
+        metrics.dump()
+    if args.output:
+        if not export_research(args.output, research):
+            return 1
+        print(f'Эксперимент сохранён в файл {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,86 @@
+import time
+
+START = time.perf_counter()
+
+import logging
 import sys
-from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import QApplication, QLabel
 
-from main_w import MainWindow, logger
+import config
 
+logger = logging.getLogger('measuring')
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv[1:])
+PHASES = []  # (фаза, с от START)
+
+
+def phase(name):
+    """Отмечает окончание фазы запуска"""
+    PHASES.append((name, time.perf_counter() - START))
+
+
+def durations():
+    """Длительности фаз запуска, с: {фаза: от конца предыдущей фазы}"""
+    previous, result = 0.0, {}
+    for name, moment in PHASES:
+        result[name] = moment - previous
+        previous = moment
+    return result
+
+
+def report():
+    """Пишет фазы запуска в журнал и их длительности в metrics
+    (startup.<фаза>)"""
+    import metrics
+
+    for name, seconds in durations().items():
+        metrics.record(f'startup.{name}', seconds)
+    phases = ', '.join(f'{name} {moment:.3f}' for name, moment in PHASES)
+    shown = dict(PHASES)['shown']
+    if shown > config.STARTUP_TARGET:
+        logger.warning(
+            f'Окно показано через {shown:.2f} с, цель {config.STARTUP_TARGET} с '
+            f'(фазы, с от старта: {phases})')
+    else:
+        logger.info(f'Окно показано через {shown:.2f} с (фазы, с от старта: {phases})')
+
+
+def start(argv):
+    """Показывает заставку, затем главное окно; БД открывается уже после
+    первой отрисовки окна"""
+    app = QApplication(argv)
+    # QSplashScreen.show ждёт отрисовки окна до секунды, простой надписи
+    # хватает
+    splash = QLabel(
+        "ТППОСУ: загрузка...", alignment=Qt.AlignCenter,
+        windowFlags=Qt.SplashScreen | Qt.FramelessWindowHint)
+    splash.resize(400, 120)
+    splash.show()
+    app.processEvents()
+    phase('splash')
+
+    from main_w import MainWindow  # numpy, SQLAlchemy, модели
+    phase('imports')
     window = MainWindow()
+    phase('window')
     window.showFullScreen()
-    logger.info('Приложение запущено')
+    splash.close()
+    app.processEvents()
+    phase('shown')
+
+    def open_database():
+        if not window.open_database():
+            return
+        phase('database')
+        report()
+        logger.info('Приложение запущено')
+
+    QTimer.singleShot(0, open_database)
+    return app, window
+
+
+if __name__ == "__main__":
+    app, window = start(sys.argv[1:])
     # window.show()
     returncode = app.exec()
     sys.exit(returncode)
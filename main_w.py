@@ -1,87 +1,108 @@
 import logging
 import os
-import numpy as np
 from functools import partial
-from datetime import datetime
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QGridLayout,
-    QTableView, QHeaderView, QLineEdit, QTabWidget, QLabel, QComboBox, QFileDialog
+    QTableView, QHeaderView, QLineEdit, QTabWidget, QLabel, QComboBox, QFileDialog,
+    QProgressBar
 )
-from PySide6.QtCore import Qt, Signal
+from PySide6.QtCore import Qt, QObject, Signal, Slot, QThread
 
-import plantm
+import plants
 import config
+import metrics
 import models
 import widgets
-from openpyxl import Workbook
 from windows import MeasureWindow
+from acquisition import AcquisitionWorker, ContinuousWorker
 
 logger = logging.getLogger('measuring')
 logger.setLevel(10)
 
 
-def fill_cmb(cmb, column_name):
-    """Заполняет QComboBox уникальными значениями из столбца БД"""
+@metrics.timed('fill_cmb')
+def fill_cmb(cmb, column_name, distinct):
+    """Заполняет QComboBox уникальными значениями столбца из кэша"""
     cmb.clear()
     cmb.addItem("Все")  # Опция для сброса фильтра
+    for value in distinct.get(column_name):
+        cmb.addItem(str(value))
 
-    with models.Session() as session:
-        # Получаем уникальные значения столбца
-        table = models.entries.Entries
-        if hasattr(models.users.User, column_name):
-            table = models.users.User
-        data = session.query(getattr(table, column_name)).distinct().all()
-        if data and isinstance(data[0][0], float):
-            data = map(lambda v: (round(v[0], 3),), data)
-        for line in sorted(set(data)):
-            cmb.addItem(str(line[0]))
-
-
-def get_frame(measurements):
-    frame = []
-    for ch in sorted(measurements):
-        if ch in config.BASE_CHANNELS:
-            frame.append(round(measurements[ch], 4))
-            if (
-                (b := config.BORDERS.get(ch))
-                and (b[0] > measurements[ch] or measurements[ch] > b[1])
-            ):
-                logger.warning(
-                    f'канал {ch}: значение {measurements[ch]} вне диапазона '
-                    f'[{b[0]}, {b[1]}]')
-        else:
-            frame.append(round(np.mean(measurements[ch]), 4))
-            frame.append(round(np.var(measurements[ch]), 4))
-    return frame
+
+def add_cmb_items(cmb, values):
+    """Добавляет в QComboBox новые значения, сохраняя сортировку"""
+    for value in sorted(set(values)):
+        text = str(value)
+        if cmb.findText(text) >= 0:
+            continue
+        pos = 1  # после "Все"
+        while pos < cmb.count() and type(value)(cmb.itemText(pos)) < value:
+            pos += 1
+        cmb.insertItem(pos, text)
+
+
+class Loader(QObject):
+    """Выполняет fn вне GUI-потока и передаёт результат сигналом loaded"""
+    loaded = Signal(object)
+    finished = Signal()
+
+    def __init__(self, fn, parent=None):
+        super().__init__(parent)
+        self.fn = fn
+
+    @Slot()
+    def run(self):
+        try:
+            self.loaded.emit(self.fn())
+        except Exception:
+            logger.exception('Ошибка фоновой загрузки из БД')
+        self.finished.emit()
 
 
 class MainWindow(QWidget):
     measure_params_sig = Signal(list)
+    continuous_params_sig = Signal(list)
     filter_params_sig = Signal(list)
     def __init__(self):
         super().__init__()
         self.measure_params_sig.connect(self.get_frame)
+        self.continuous_params_sig.connect(self.start_continuous)
         # self.filter_params_sig.connect(self.run_filter)
-        self.plant = plantm.Plant()
+        self._plant = None  # создаётся при первой съёмке
+        self.acquisition = None  # (поток, исполнитель, параметры) текущей съёмки
+        self.export = None  # (поток, исполнитель) текущего сохранения
+        self.loaders = {}  # поток фоновой загрузки -> исполнитель
+        self.entry_model = None  # модели кадров создаёт open_database
+        self.entries_requested = False  # первая страница кадров уже запрошена
+        self.distinct = models.DistinctValues()
         self.setWindowTitle("ТППОСУ Бригада 9")
         self.setGeometry(50, 50, 1600, 700)
         self.windows = {
-            'measure': MeasureWindow(self.measure_params_sig),
+            'measure': MeasureWindow(
+                self.measure_params_sig, self.continuous_params_sig),
             # 'filter': FilterWindow(self.filter_params_sig),
         }
         
-        # Кнопки
+        # Кнопки; работающие с БД включает open_database
         add_button = QPushButton(
-            "Снять показания",
+            "Снять показания", enabled=False,
             clicked=partial(self.show_window, 'measure'))
         filter_button = QPushButton(
-            "Фильтровать",
+            "Фильтровать", enabled=False,
             clicked=self.toggle_filter)
         save_button = QPushButton(
-            "Сохранить выборку",
+            "Сохранить выборку", enabled=False,
             clicked=self.save_view
         )
+        self.db_buttons = [add_button, filter_button, save_button]
         exit_button = QPushButton("Выход", clicked=self.close_all)
+        self.progress_bar = QProgressBar(visible=False)
+        self.rate_label = QLabel(visible=False)
+        self.cancel_button = QPushButton(
+            "Остановить", clicked=self.cancel_acquisition, visible=False)
+        self.export_progress = QProgressBar(visible=False)
+        self.export_cancel = QPushButton(
+            "Отменить сохранение", clicked=self.cancel_export, visible=False)
 
         self.filter_layout = QVBoxLayout()
         self.filter_container = QWidget()  # Контейнер для фильтров
@@ -91,30 +112,45 @@ class MainWindow(QWidget):
         self.general_widgets = []
         # self.create_filter_widgets()  # Создаем фильтры сразу
 
-        # Таблицы
+        # Таблицы; данные загружает open_database после показа окна
         tab_widget = QTabWidget()
         
         self.users_view = QTableView(sortingEnabled=True)
-        self.load_users()
         tab_widget.addTab(self.users_view, "Пользователи")
         
         self.entries_view = QTableView(sortingEnabled=True)
         self.stats_table = QTableView()        
-        self.load_entries()
         vHeader = self.stats_table.verticalHeader()
         vHeader.setSectionResizeMode(QHeaderView.Stretch)
-        width = sum(self.entries_view.columnWidth(i) for i in range(4))
-        vHeader.setFixedWidth(width)
-        vHeader.setMinimumWidth(width)
         
         tab_widget.addTab(self.entries_view, "Кадры")
+        tab_widget.currentChanged.connect(self.tab_changed)
+        self.tab_widget = tab_widget
+
+        self.live_model = models.LiveFramesModel(self)
+        live_view = QTableView()
+        live_view.setModel(self.live_model)
+        live_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        tab_widget.addTab(live_view, "Поток")
         btns_layout = QHBoxLayout()
         btns_layout.addWidget(add_button)
         btns_layout.addWidget(filter_button)
         btns_layout.addWidget(save_button)
+        btns_layout.addWidget(self.progress_bar)
+        btns_layout.addWidget(self.rate_label)
+        btns_layout.addWidget(self.cancel_button)
+        btns_layout.addWidget(self.export_progress)
+        btns_layout.addWidget(self.export_cancel)
         
-        logpane = widgets.LogWidget(level=logger.level)
-        logger.addHandler(logpane)
+        self.logpane = widgets.LogWidget(
+            level=logger.level, interval=config.LOG_FLUSH_INTERVAL,
+            max_lines=config.LOG_MAX_LINES, spill=config.LOG_FILE,
+            spill_bytes=config.LOG_FILE_BYTES,
+            spill_backups=config.LOG_FILE_BACKUPS)
+        logger.addHandler(self.logpane)
+        log_tabs = QTabWidget()
+        log_tabs.addTab(self.logpane, "Журнал")
+        log_tabs.addTab(widgets.MetricsWidget(), "Метрики")
         
         layout = QVBoxLayout()
         layout.addLayout(btns_layout)
@@ -123,18 +159,111 @@ class MainWindow(QWidget):
         layout.addWidget(tab_widget, stretch=6)
         self.stats_table.setFixedHeight(80)
         layout.addWidget(self.stats_table)
-        layout.addWidget(logpane, stretch=1)
+        layout.addWidget(log_tabs, stretch=1)
         layout.addWidget(exit_button)
         layout.setAlignment(
             exit_button,
             Qt.AlignmentFlag.AlignBottom| Qt.AlignmentFlag.AlignRight)
         self.setLayout(layout)
-    
+
+    @property
+    def plant(self):
+        if self._plant is None:
+            self._plant = plants.create_plant()
+        return self._plant
+
+    def open_database(self):
+        """Подключает БД и загружает эксперименты. Статистика кадров
+        считается в фоне, а сами кадры читаются при первом показе вкладки.
+        Возвращает False, если БД открыть не удалось"""
+        try:
+            models.init_db()
+        except Exception:
+            logger.exception('Не удалось открыть базу данных, съёмка и выборки недоступны')
+            return False
+        self.load_users()
+        self.create_entry_models()
+        self.filter_scheduler = models.FilterScheduler(
+            [self.user_proxy_model, self.entry_proxy_model],
+            prepare=self.push_down_filters, parent=self)
+        self.filter_scheduler.applied.connect(self.filters_applied)
+        self.start_loader(
+            partial(self.stats_model.query_stats, self.entry_model.where),
+            self.stats_loaded)
+        if self.tab_widget.currentWidget() is self.entries_view:
+            self.tab_changed(self.tab_widget.currentIndex())
+        for button in self.db_buttons:
+            button.setEnabled(True)
+        return True
+
+    def start_loader(self, fn, slot):
+        """Выполняет fn в отдельном потоке и передаёт результат в slot"""
+        thread = QThread(self)
+        worker = Loader(fn)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.loaded.connect(slot)
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(self.loader_finished)
+        self.loaders[thread] = worker
+        thread.start()
+
+    def loader_finished(self):
+        thread = self.sender()
+        self.loaders.pop(thread, None)
+        thread.deleteLater()
+
+    def tab_changed(self, index):
+        if (self.tab_widget.widget(index) is not self.entries_view
+                or self.entries_requested or self.entry_model is None):
+            return
+        self.entries_requested = True
+        self.start_loader(self.read_entries, self.entries_loaded)
+
+    @metrics.timed('load_entries.read')
+    def read_entries(self):
+        """Первая страница кадров; выполняется в потоке Loader"""
+        return self.entry_model.load_page()
+
+    @metrics.timed('load_entries.insert')
+    def entries_loaded(self, page):
+        # Пока страница читалась, модель могли заполнить из GUI-потока
+        # (новые кадры, фильтры)
+        if not self.entry_model.started():
+            self.entry_model.insert_page(*page)
+            if not self.entry_model.canFetchMore():
+                self.stats_model.updateStats()
+        self.show_entries()
+
+    def stats_loaded(self, result):
+        if self.entry_proxy_model.has_filters() or self.entry_model.where:
+            return  # статистику уже пересчитал filters_applied
+        if self.entry_model.started() and not self.entry_model.canFetchMore():
+            self.stats_model.updateStats()  # таблица целиком в памяти
+        else:
+            self.stats_model.setStats(result)
+
     def close_all(self):
         for w in self.windows.values():
             w.close()
+        if self.acquisition is not None:
+            thread, worker, _ = self.acquisition
+            worker.cancel()
+            thread.quit()
+            thread.wait()
+        if self.export is not None:
+            thread, worker = self.export
+            worker.cancel()
+            thread.quit()
+            thread.wait()
+        for thread in list(self.loaders):
+            thread.quit()
+            thread.wait()
+        if metrics.enabled() and config.METRICS_FILE:
+            metrics.dump()
         logger.info('Завершение работы')
-        logger.removeHandler(self.layout().itemAt(4).widget())
+        logger.removeHandler(self.logpane)
         self.close()
 
     def toggle_filter(self):
@@ -154,7 +283,7 @@ class MainWindow(QWidget):
         combo = QComboBox()
         combo.setEditable(True)
         combo.addItem("Все")
-        fill_cmb(combo, column_name)
+        fill_cmb(combo, column_name, self.distinct)
         combo.currentIndexChanged.connect(
             partial(self.update_filter_cmb, table_name, column_name, combo))
         return combo
@@ -227,8 +356,8 @@ class MainWindow(QWidget):
         proxy_model = self.user_proxy_model
         if table_name != "Users":
             proxy_model = self.entry_proxy_model
-        proxy_model.set_combo_filter(column_name, filter_value)
-        self.stats_model.updateStats()
+        proxy_model.set_combo_filter(column_name, filter_value, invalidate=False)
+        self.filter_scheduler.schedule()
     
     def update_range_filter(self, table_name, column, ismin, text, *args):
         proxy_model = self.user_proxy_model
@@ -241,8 +370,9 @@ class MainWindow(QWidget):
         else:
             max_value = value
 
-        proxy_model.set_range_filter(column, min_value, max_value)
-        self.stats_model.updateStats()
+        proxy_model.set_range_filter(
+            column, min_value, max_value, invalidate=False)
+        self.filter_scheduler.schedule()
 
     def clear_filters(self):
         """Очищает все фильтры и сбрасывает комбобоксы"""
@@ -253,19 +383,27 @@ class MainWindow(QWidget):
                     elem.clear()
             else:
                 element.setCurrentIndex(0)
-        self.user_proxy_model.clear_combo_filters()
-        self.entry_proxy_model.clear_combo_filters()
+        self.user_proxy_model.clear_combo_filters(invalidate=False)
+        self.entry_proxy_model.clear_combo_filters(invalidate=False)
+        self.filter_scheduler.schedule()
         logger.info('Фильтры сброшены')
-    
-    def remove_filter(self):
-        while self.filter_layout.count():
-            item = self.filter_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-        # self.filter_container.setLayout(None)
-        # del self.filter_layout
 
+    def filters_applied(self):
+        self.stats_model.updateStats()
+
+    def push_down_filters(self):
+        """Распространяет фильтры пользователей на кадры и переносит их в SQL"""
+        user_where, entry_where = models.query.build_where(
+            self.user_proxy_model, self.entry_proxy_model)
+        researches = None
+        if user_where:
+            with models.Session() as session:
+                researches = models.query.researches(session, user_where)
+        self.entry_proxy_model.set_values_filter(
+            'research', researches, invalidate=False)
+        self.user_model.push_down(user_where)
+        self.entry_model.push_down(entry_where)
+    
     def show_window(self, name, *args):
         if self.windows.get(name) is None:
             return
@@ -274,18 +412,11 @@ class MainWindow(QWidget):
         else:
             self.windows[name].show()
 
-    def load_entries(self):
-        """Загружает данные из базы и обновляет модель"""
-        with models.Session() as session:
-            entries = session.query(models.entries.Entries).all()
-        self.entry_model = models.entries.DataTableModel(entries)
+    def create_entry_models(self):
+        """Пустые модели кадров и статистики, без обращения к БД"""
+        self.entry_model = models.entries.DataTableModel(fetch=False)
         self.entry_proxy_model = models.FilterProxyModel(models.entries.COLUMNS)
         self.entry_proxy_model.setSourceModel(self.entry_model)
-        self.entries_view.setModel(self.entry_proxy_model)
-        self.entries_view.resizeColumnsToContents()
-        header = self.entries_view.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.Stretch)
-        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
         
         self.stats_model = models.entries.EntryStatsModel()
         self.stats_model.setProxyModel(self.entry_proxy_model)
@@ -294,13 +425,27 @@ class MainWindow(QWidget):
             models.entries.HEADERS)       
         self.stats_table.setModel(self.stats_model)
         self.stats_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.stats_model.updateStats()
 
+    def show_entries(self):
+        """Подключает загруженную модель кадров к таблице"""
+        if self.entries_view.model() is self.entry_proxy_model:
+            return
+        self.entries_view.setModel(self.entry_proxy_model)
+        header = self.entries_view.horizontalHeader()
+        # по умолчанию ширина подбирается по всем загруженным строкам
+        header.setResizeContentsPrecision(config.RESIZE_ROWS)
+        self.entries_view.resizeColumnsToContents()
+        header.setSectionResizeMode(QHeaderView.Stretch)
+        header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        vHeader = self.stats_table.verticalHeader()
+        width = sum(self.entries_view.columnWidth(i) for i in range(4))
+        vHeader.setFixedWidth(width)
+        vHeader.setMinimumWidth(width)
+
+    @metrics.timed('load_users')
     def load_users(self):
         """Загружает данные из базы и обновляет модель"""
-        with models.Session() as session:
-            users = session.query(models.users.User).all()
-        self.user_model = models.users.UserTableModel(users)
+        self.user_model = models.users.UserTableModel()
         self.user_proxy_model = models.FilterProxyModel(models.users.COLUMNS)
         self.user_proxy_model.setSourceModel(self.user_model)
         self.users_view.setModel(self.user_proxy_model)
@@ -308,106 +453,153 @@ class MainWindow(QWidget):
         header = self.users_view.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
         
-    def measure(self):
-        results, stable = {}, {}
-        for ch in config.FRMAME_ORDER:
-            if ch in config.BASE_CHANNELS:
-                results[ch] = self.plant.measure(ch)
-            elif ch in config.STABLE_CHANNELS:
-                m = self.plant.measure(ch)
-                if (last := stable.get(ch, m)) != m:
-                    logger.error(f'канал {ch}: нарушение стабильности ({last}->{m})')
-                    return None
-                stable[ch] = m
-            elif ch in config.MV_CHANNELS:
-                results[ch] = [
-                    self.plant.measure(ch) for _ in range(config.MV_CHANNELS[ch])]
-
-        return results
+    def new_research(self, username, comment):
+        """Создаёт запись эксперимента и возвращает его номер"""
+        user = models.users.create_research(username, comment)
+        self.user_model.append_rows([user])
+        self.update_cmb_items(
+            {c: [getattr(user, c)] for c in models.users.COLUMNS})
+        return user.research
 
     def get_frame(self, args):
         username, n_frames, comment = args
-        date = datetime.now().date()
-        kwargs = dict(zip(models.users.MUTABLE_COLUMNS, [date, username, comment]))
-        user = models.users.User(**kwargs)
-        with models.Session() as session:
-            session.add(user)
-            session.commit()
-            cur_research = session.query(
-                models.users.User).order_by(
-                    models.users.User.research.desc()).first().research
-
-        base_frame = [cur_research]
-        frames = []
-        for _ in range(n_frames):
-            frame = base_frame + [datetime.now().time()]
-            results = self.measure()
-            if results is None:
+        if self.acquisition is not None:
+            logger.warning('Съёмка уже идёт, дождитесь её завершения')
+            return
+        worker = AcquisitionWorker(
+            self.plant, self.new_research(username, comment), n_frames)
+        worker.progress.connect(self.show_progress)
+        self.progress_bar.setRange(0, n_frames)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.start_acquisition(worker, (username, comment))
+
+    def start_continuous(self, args):
+        username, comment, rate = args
+        if self.acquisition is not None:
+            logger.warning('Съёмка уже идёт, дождитесь её завершения')
+            return
+        if rate == '':
+            rate = None
+        elif not isinstance(rate, (int, float)) or rate <= 0:
+            logger.error(f'Неверная частота съёмки: {rate!r}')
+            return
+        worker = ContinuousWorker(
+            self.plant, self.new_research(username, comment), rate)
+        worker.window_ready.connect(self.live_model.set_frames)
+        worker.rate_changed.connect(self.show_rate)
+        self.rate_label.setText(f'Непрерывная съёмка, {worker.rate:g} кадров/с')
+        self.rate_label.setVisible(True)
+        logger.info(f'Непрерывная съёмка с частотой {worker.rate:g} кадров/с')
+        self.start_acquisition(worker, (username, comment))
+
+    def start_acquisition(self, worker, params):
+        """Запускает исполнителя съёмки в отдельном потоке"""
+        thread = QThread(self)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.rows_ready.connect(self.append_entries)
+        worker.finished.connect(self.acquisition_finished)
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        self.acquisition = thread, worker, params
+        self.cancel_button.setVisible(True)
+        thread.start()
+
+    def show_progress(self, done, total):
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat(f'Кадр {done} из {total}')
+
+    def show_rate(self, rate, frames, missed):
+        self.rate_label.setText(
+            f'{rate:.1f} кадров/с, снято {frames}, пропущено {missed}')
+
+    def cancel_acquisition(self):
+        if self.acquisition is not None:
+            self.acquisition[1].cancel()
+
+    def append_entries(self, rows):
+        """Добавляет записанный пакет кадров в таблицу без перезагрузки"""
+        self.entry_model.append_rows(rows)
+        self.update_cmb_items(
+            {c: rows.column(c).tolist() for c in ('research',)})
+
+    def update_cmb_items(self, values):
+        """Дополняет кэш и комбобоксы фильтров новыми значениями столбцов"""
+        for column_name, column_values in values.items():
+            new = self.distinct.update(column_name, column_values)
+            container = self.filter_widgets.get(column_name)
+            if not new or container is None:
                 continue
-            frame += get_frame(results)
-            kwargs = dict(zip(models.entries.MUTABLE_COLUMNS, frame))
-            entry = models.entries.Entries(**kwargs)
-            with models.Session() as session:
-                session.add(entry)
-                session.commit()
+            combo = container.findChild(QComboBox)
+            if combo is not None:
+                add_cmb_items(combo, new)
 
-        self.load_users()
-        self.filter_container.close()
-        self.remove_filter()
-        self.filter_widgets.clear()
-        self.create_filter_widgets()
-        self.load_entries()
+    def acquisition_finished(self, research, n_frames):
+        username, comment = self.acquisition[2]
+        self.acquisition = None
+        self.progress_bar.setVisible(False)
+        self.rate_label.setVisible(False)
+        self.cancel_button.setVisible(False)
         logger.info(
             f'Пользователь "{username}" снял показания {n_frames} кадров, '
             f'комментарий: "{comment}"')
-        return frames
-
-    def calculate_statistics(self):
-        stats = {}
-        rows = self.entry_proxy_model.rowCount()
-        cols = self.entry_proxy_model.columnCount()
-        
-        for col in range(cols):
-            values = []
-            for row in range(rows):
-                idx = self.entry_proxy_model.index(row, col)
-                val = self.entry_proxy_model.data(idx, Qt.DisplayRole)
-                try:
-                    values.append(float(val))
-                except:
-                    continue
-
-            if values:
-                mean = sum(values) / len(values)
-                variance = sum((x - mean)**2 for x in values) / len(values)
-                stats[col] = (mean, variance)
-            else:
-                stats[col] = (None, None)
-        
-        return stats
-
-    def update_statistics(self):
-        stats = self.calculate_statistics()
-        self.stats_model.setStats(stats)
 
     def save_view(self):
+        import export  # нужен только при сохранении
+
+        if self.export is not None:
+            logger.warning('Сохранение уже идёт, дождитесь его завершения')
+            return
+        formats = export.formats()
         path, ok = QFileDialog.getSaveFileName(
             self, 'Сохранение', os.getenv('HOME'),
-            ';;'.join((
-                'Excel Files (*.xls, *.xlsx)',
-                'All Files (*.*)')))
+            ';;'.join((*formats.values(), 'All Files (*.*)')))
         if not ok:
             logger.error(f'Ошибка сохранения в файл {path}')
             return
-        wb = Workbook(write_only=True)
-        for i, t, model, h in zip(
-                range(2),
+        if not os.path.splitext(path)[1]:
+            # расширение по выбранному в диалоге формату
+            path += next(
+                (ext for ext, f in formats.items() if f == ok), '.xlsx')
+        tables = [
+            export.ExportTable(
+                name, t, module.HEADERS, module.COLUMNS,
+                model.sourceModel().kinds, export.selection(model))
+            for name, t, model, module in zip(
+                ('users', 'entries'),
                 ('Пользователи', 'Записи'),
                 (self.user_proxy_model, self.entry_proxy_model),
-                (models.users.HEADERS, models.entries.HEADERS)):
-            ws = wb.create_sheet(t, i)
-            ws.append(h)
-            for line in model.data_generator():
-                ws.append(line)
-        wb.save(path)
-        logger.info(f'Выборка сохранена в файл {path}')
+                (models.users, models.entries))]
+
+        thread = QThread(self)
+        worker = export.ExportWorker(path, tables)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.show_export_progress)
+        worker.finished.connect(self.export_finished)
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        self.export = thread, worker
+        self.export_progress.setValue(0)
+        self.export_progress.setVisible(True)
+        self.export_cancel.setVisible(True)
+        thread.start()
+
+    def show_export_progress(self, done, total):
+        self.export_progress.setRange(0, total)
+        self.export_progress.setValue(done)
+        self.export_progress.setFormat(f'Сохранено {done} из {total}')
+
+    def cancel_export(self):
+        if self.export is not None:
+            self.export[1].cancel()
+
+    def export_finished(self, path, done):
+        self.export = None
+        self.export_progress.setVisible(False)
+        self.export_cancel.setVisible(False)
+        if done:
+            logger.info(f'Выборка сохранена в файл {path}')
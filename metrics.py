@@ -0,0 +1,125 @@
+"""Замеры времени горячих участков.
+
+Участки размечаются контекстом span(name) или декоратором timed(name) и
+сводятся в гистограммы (число вызовов, p50, p95, максимум). Пока замеры
+выключены, span возвращает общий пустой контекст, а timed - сразу
+вызывает функцию, так что разметка почти ничего не стоит.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+import numpy as np
+
+import config
+
+logger = logging.getLogger('measuring')
+
+_enabled = bool(os.getenv('TTPOSU_METRICS')) or config.METRICS
+_histograms = {}
+_lock = threading.Lock()
+_null = nullcontext()
+
+
+class Histogram:
+    """Длительности одного участка: точные счётчики и последние samples замеров"""
+    def __init__(self, samples=None):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=samples or config.METRICS_SAMPLES)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self):
+        p50, p95 = np.percentile(self.samples, [50, 95]) if self.samples else (0, 0)
+        return {
+            'count': self.count, 'total': self.total,
+            'p50': float(p50), 'p95': float(p95), 'max': self.max}
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.start)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(state=True):
+    global _enabled
+    _enabled = state
+
+
+def record(name, seconds):
+    with _lock:
+        if (hist := _histograms.get(name)) is None:
+            hist = _histograms[name] = Histogram()
+        hist.add(seconds)
+
+
+def span(name, label=None):
+    """Контекст замера участка name; label уточняет имя (например, канал)"""
+    if not _enabled:
+        return _null
+    return _Span(name if label is None else f'{name}[{label}]')
+
+
+def timed(name):
+    """Декоратор: замер каждого вызова функции как участка name"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """Сводка по всем участкам: {имя: {count, total, p50, p95, max}}"""
+    with _lock:
+        items = [(name, hist.summary()) for name, hist in _histograms.items()]
+    return dict(sorted(items))
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def dump(path=None):
+    """Сохраняет сводку в JSON-файл и пишет её в журнал measuring"""
+    path = path or config.METRICS_FILE
+    data = snapshot()
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        logger.info(f'Метрики сохранены в файл {path}')
+    logger.debug(f'Метрики: {json.dumps(data, ensure_ascii=False)}')
+    return data
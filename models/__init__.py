@@ -1,19 +1,51 @@
 import os
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-# Настройка базы данных
-db_path = Path(os.getenv('APPDATA'), 'TTPOSU')
-db_path.mkdir(exist_ok=True)
-db_path /= 'database.db'
-DATABASE_URL = f"sqlite:///{db_path}"
-engine = create_engine(DATABASE_URL)
+# База данных подключается явно, вызовом init_db()
+db_path = None
+engine = None
 Base = declarative_base()
-Session = sessionmaker(bind=engine)
+Session = sessionmaker()
 
+from .paging import SORT_ROLE
 from . import users
 from . import entries
-from .filter import FilterProxyModel
+from . import stats
+from . import samples
+from .filter import FilterProxyModel, FilterScheduler
+from . import query
+from .ingest import FrameWriter, FrameBatch
+from .distinct import DistinctValues
+from .live import LiveFramesModel
 
-Base.metadata.create_all(engine)
+from . import schema
+
+
+def default_path():
+    appdata = os.getenv('APPDATA')
+    if not appdata:
+        raise RuntimeError('Не задана переменная окружения APPDATA, путь к БД неизвестен')
+    return Path(appdata, 'TTPOSU', 'database.db')
+
+
+def init_db(path=None):
+    """Подключает БД (по умолчанию %APPDATA%/TTPOSU/database.db) и обновляет
+    её схему; повторные вызовы возвращают уже созданный движок. Если схему
+    обновить не удалось, БД остаётся неподключённой"""
+    global db_path, engine
+    if engine is not None:
+        return engine
+    path = Path(path) if path else default_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    new = create_engine(f"sqlite:///{path}")
+    event.listen(new, 'connect', schema.set_pragmas)
+    try:
+        schema.upgrade(new)
+    except Exception:
+        new.dispose()
+        raise
+    Session.configure(bind=new)
+    engine, db_path = new, path
+    return engine
@@ -0,0 +1,22 @@
+"""Обслуживание БД: python -m models rebuild-stats"""
+import argparse
+
+from . import Session, init_db, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m models')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser(
+        'rebuild-stats', help='пересчитать research_stats по таблице entries')
+    args = parser.parse_args()
+    init_db()
+    if args.command == 'rebuild-stats':
+        with Session.begin() as session:
+            stats.rebuild(session)
+            n = session.query(stats.ResearchStats).count()
+        print(f'research_stats пересчитана: {n} строк')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import numpy as np
+
+FETCH_SIZE = 50_000  # строк за одну выборку из курсора
+
+
+class ColumnStore:
+    """Столбцовое хранилище: по одному типизированному массиву NumPy на столбец"""
+    def __init__(self, dtypes, capacity=0):
+        self.names = list(dtypes)
+        self.dtypes = [np.dtype(dtypes[name]) for name in self.names]
+        self.arrays = [np.empty(capacity, dtype) for dtype in self.dtypes]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name):
+        """Массив значений столбца (представление, без копирования)"""
+        return self.arrays[self.names.index(name)][:self.size]
+
+    def __getitem__(self, i):
+        return self.arrays[i][:self.size]
+
+    def reserve(self, n):
+        """Гарантирует место ещё под n строк (рост в 1.5 раза)"""
+        need = self.size + n
+        capacity = len(self.arrays[0]) if self.arrays else 0
+        if need <= capacity:
+            return
+        capacity = max(need, capacity + capacity // 2, 1024)
+        for i, array in enumerate(self.arrays):
+            grown = np.empty(capacity, array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.arrays[i] = grown
+
+    def append_columns(self, columns):
+        """Добавляет строки, заданные последовательностями по столбцам"""
+        n = len(columns[0])
+        if not n:
+            return
+        self.reserve(n)
+        for array, values in zip(self.arrays, columns):
+            array[self.size:self.size + n] = values
+        self.size += n
+
+    def extend(self, other):
+        """Добавляет строки другого хранилища с теми же столбцами"""
+        self.append_columns([other[i] for i in range(len(self.names))])
+
+    def insert(self, row, other):
+        """Вставляет строки другого хранилища перед строкой row"""
+        n = len(other)
+        if not n:
+            return
+        self.reserve(n)
+        for i, array in enumerate(self.arrays):
+            array[row + n:self.size + n] = array[row:self.size]
+            array[row:row + n] = other[i]
+        self.size += n
+
+    def append_rows(self, rows):
+        """Добавляет строки-кортежи в порядке столбцов"""
+        if rows:
+            self.append_columns(list(zip(*rows)))
+
+    def fill(self, result, fetch_size=FETCH_SIZE):
+        """Заполняет хранилище из результата Core-запроса порциями"""
+        for part in result.partitions(fetch_size):
+            self.append_rows(part)
+        return self
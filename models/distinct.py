@@ -0,0 +1,54 @@
+from sqlalchemy import select
+
+from . import Session
+from .users import User
+from .entries import Entries
+
+MAX_VALUES = 1000  # значений столбца в кэше и в комбобоксе
+
+
+class DistinctValues:
+    """Кэш уникальных значений столбцов для комбобоксов фильтров.
+
+    Столбец читается из БД один раз (SELECT DISTINCT), дальше кэш
+    пополняется вставленными строками. Для столбцов с большим числом
+    значений хранится не более max_values.
+    """
+    def __init__(self, max_values=MAX_VALUES):
+        self.max_values = max_values
+        self._values = {}
+        self.truncated = set()  # столбцы, где значений больше max_values
+
+    def get(self, column_name):
+        if column_name not in self._values:
+            self._load(column_name)
+        return sorted(self._values[column_name])
+
+    def _load(self, column_name):
+        table = User if hasattr(User, column_name) else Entries
+        stmt = select(getattr(table, column_name)).distinct().limit(
+            self.max_values + 1)
+        with Session() as session:
+            values = session.execute(stmt).scalars().all()
+        self._values[column_name] = set()
+        self.update(column_name, values, loaded=True)
+
+    def update(self, column_name, values, loaded=False):
+        """Добавляет значения; возвращает новые для кэша"""
+        cache = self._values.get(column_name)
+        if cache is None:
+            return set()  # столбец ещё не читали, прочитаем при обращении
+        new = set()
+        for value in values:
+            if value is None:
+                continue
+            if isinstance(value, float):
+                value = round(value, 3)
+            if value in cache:
+                continue
+            if len(cache) >= self.max_values:
+                self.truncated.add(column_name)
+                break
+            cache.add(value)
+            new.add(value)
+        return new
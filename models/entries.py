@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, Float, Time
+from datetime import time
+from sqlalchemy import Column, Integer, Float, Time, ForeignKey, select, cast, func
 from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
 import numpy as np
-from . import Base
+
+import metrics
+from . import Base, Session
+from .columnar import ColumnStore
+from .paging import PagedModelMixin, SORT_ROLE
 
 HEADERS = [
     "ID", "Эксперимент", "Время (ЧЧ:ММ:СС)", "Температура", "Давление", 'Влажность', 'Датчик4',
@@ -11,16 +16,19 @@ MUTABLE_COLUMNS = [
     'sensor6_mean', 'sensor6_var', 'observation20', 'observation43', 'observation58']
 COLUMNS = ['id'] + MUTABLE_COLUMNS
 TIME_FORMAT = '%H:%M:%S'
+KINDS = ['int', 'int', 'time'] + ['float'] * (len(COLUMNS) - 3)
+# Время хранится в секундах от полуночи
+DTYPES = dict.fromkeys(COLUMNS, np.float64) | {'id': np.int64, 'research': np.int64}
 
 class Entries(Base):
     __tablename__ = "entries"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    research = Column(Integer)
-    time = Column(Time)
-    temperature = Column(Float, nullable=False)
-    pressure = Column(Float, nullable=False)
-    humidity = Column(Float, nullable=False)
+    research = Column(Integer, ForeignKey('users.research'), index=True)
+    time = Column(Time, index=True)
+    temperature = Column(Float, nullable=False, index=True)
+    pressure = Column(Float, nullable=False, index=True)
+    humidity = Column(Float, nullable=False, index=True)
     sensor4 = Column(Float, nullable=False)
     sensor5 = Column(Float, nullable=False)
     sensor6_mean = Column(Float, nullable=False)
@@ -30,51 +38,132 @@ class Entries(Base):
     observation58 = Column(Float, nullable=False)
 
 
-class DataTableModel(QAbstractTableModel):
-    def __init__(self, entries, parent=None):
+def time_to_seconds(t):
+    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6
+
+
+def seconds_to_time(seconds):
+    seconds = float(seconds)
+    whole = int(seconds)
+    return time(
+        whole // 3600, whole // 60 % 60, whole % 60,
+        int(round((seconds - whole) * 1e6)) % 1_000_000)
+
+
+def format_time(seconds):
+    """Секунды от полуночи в строку вида TIME_FORMAT"""
+    seconds = int(seconds)
+    return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+
+def time_seconds():
+    """SQL-выражение: время записи в секундах от полуночи"""
+    # Time хранится в SQLite строкой 'ЧЧ:ММ:СС.ffffff'
+    return (
+        cast(func.substr(Entries.time, 1, 2), Integer) * 3600
+        + cast(func.substr(Entries.time, 4, 2), Integer) * 60
+        + cast(func.substr(Entries.time, 7), Float))
+
+
+def columns_select():
+    """Core-запрос всех столбцов COLUMNS, время - в секундах от полуночи"""
+    seconds = time_seconds()
+    return select(*(
+        seconds if name == 'time' else getattr(Entries, name)
+        for name in COLUMNS))
+
+
+def load_columns(session, *where, limit=None):
+    """Загружает записи в столбцовое хранилище, минуя ORM-объекты"""
+    stmt = columns_select().where(*where).order_by(Entries.id).limit(limit)
+    return ColumnStore(DTYPES).fill(session.execute(stmt))
+
+
+def aggregate_stats(session, columns, *where):
+    """Число строк, средние и суммы квадратов отклонений столбцов средствами SQL"""
+    cols = [getattr(Entries, name) for name in columns]
+    count, *means = session.execute(
+        select(func.count(), *map(func.avg, cols)).where(*where)).one()
+    if not count:
+        return 0, np.zeros(len(cols)), np.zeros(len(cols))
+    m2 = session.execute(select(*(
+        func.sum((col - mean) * (col - mean))
+        for col, mean in zip(cols, means))).where(*where)).one()
+    return count, np.array(means, np.float64), np.array(m2, np.float64)
+
+
+class DataTableModel(PagedModelMixin, QAbstractTableModel):
+    """Кадры в столбцовом хранилище.
+
+    Без готового хранилища строки подгружаются из БД страницами по мере
+    прокрутки (canFetchMore/fetchMore). С fetch=False модель создаётся
+    пустой, а первую страницу можно прочитать в фоне (load_page/insert_page).
+    """
+    kinds = KINDS
+    key = Entries.__table__.c.id
+
+    def __init__(self, store=None, where=(), parent=None, fetch=True):
         super().__init__(parent)
-        self.entries = entries
-
-    def calculate_statistics(self):
-        for col in range(3, 13):  # Столбцы для статистики
-            column_data = []
-            for entry in self.entries:
-                column_map = [
-                    entry.id, entry.research, entry.time.strftime(TIME_FORMAT),
-                    entry.temperature, entry.pressure, entry.humidity,
-                    entry.sensor4, entry.sensor5, entry.sensor6_mean,
-                    entry.sensor6_var, entry.observation20, entry.observation43,
-                    entry.observation58
-                ]
-                value = column_map[col]
-                if isinstance(value, (int, float)):
-                    column_data.append(value)
+        self._time_column = COLUMNS.index('time')
+        self.init_paging(where, loaded=store is not None)
+        self.store = store
+        if store is None:
+            self.store = ColumnStore(DTYPES)
+            if fetch:
+                self.fetchMore()
+
+    def _load_page(self):
+        with Session() as session:
+            page = load_columns(
+                session, *self.where, *self.pager.where(),
+                limit=self.pager.page_size)
+        return page, page.column('id')
+
+    def _insert(self, row, page):
+        self.store.insert(row, page)
+
+    def _clear(self):
+        self.store = ColumnStore(DTYPES)
+
+    def raw_select(self):
+        """Core-запрос всей выборки модели в единицах raw(), в обход страниц"""
+        return columns_select().where(*self.where).order_by(Entries.id)
+
+    def append_rows(self, rows):
+        """Добавляет в конец модели новые кадры (ColumnStore со столбцами COLUMNS)"""
+        if not len(rows):
+            return
+        self.pager.hold(int(rows.column('id')[0]))
+        if not self.started():
+            self.fetchMore()  # кадры до новых должны идти перед ними
+        first = self.store.size
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.store.extend(rows)
+        self.endInsertRows()
+
+    def raw(self, column):
+        """Типизированные значения столбца (время - в секундах)"""
+        return self.store[column]
 
     def rowCount(self, parent=None):
-        return len(self.entries)
+        return self.store.size
 
     def columnCount(self, parent=None):
-        return 13
+        return len(COLUMNS)
 
     def data(self, index, role=Qt.DisplayRole):
-        if not index.isValid() or role != Qt.DisplayRole:
+        if not index.isValid() or role not in (Qt.DisplayRole, SORT_ROLE):
             return None
 
-        row = index.row()
         column = index.column()
-
-        entry = self.entries[row]
-        column_map = [
-            entry.id, entry.research, entry.time.strftime(TIME_FORMAT),
-            entry.temperature, entry.pressure, entry.humidity,
-            entry.sensor4, entry.sensor5, entry.sensor6_mean,
-            entry.sensor6_var, entry.observation20, entry.observation43,
-            entry.observation58
-        ]
-        res = column_map[column]
-        if not isinstance(res, (int, float)):
-            return res
-        return round(res, 3)
+        res = self.store.arrays[column][index.row()]
+        if role == SORT_ROLE:
+            return res.item()
+        if column == self._time_column:
+            return format_time(res)
+        if res.dtype.kind == 'i':
+            return int(res)
+        return round(float(res), 3)
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if role == Qt.DisplayRole:
@@ -90,10 +179,18 @@ class EntryStatsModel(QAbstractTableModel):
         self._stats = {}
         self._cols = []
         self.headers = []
+        self.proxy = None
+        self._from_sql = False  # статистика посчитана в БД, а не по загруженным строкам
+        # Накопители Чана по столбцам: число строк, средние, суммы квадратов отклонений
+        self._count = 0
+        self._mean = np.zeros(0)
+        self._m2 = np.zeros(0)
         
     def setStatsColumns(self, numeric_columns, labels=None):
         self._cols = numeric_columns
         self.headers = labels or self._cols
+        self._count = 0
+        self._mean = self._m2 = np.zeros(len(self._cols))
         
     def rowCount(self, parent=QModelIndex()):
         return 2
@@ -122,21 +219,89 @@ class EntryStatsModel(QAbstractTableModel):
         return None
 
     def setProxyModel(self, proxy):
+        if self.proxy is not None:
+            self.proxy.sourceModel().rowsInserted.disconnect(self._rows_inserted)
         self.proxy = proxy
-    
-    def updateStats(self):
-        for col in self._cols:
-            col_data = [
-                float(self.proxy.data(
-                    self.proxy.index(i, col), Qt.DisplayRole))
-                for i in range(self.proxy.rowCount())]
-
-            if col_data:
-                mean = sum(col_data) / len(col_data)
-                variance = sum((x - mean)*(x - mean) for x in col_data) / len(col_data)
-                self._stats[col] = (mean, variance)
+        proxy.sourceModel().rowsInserted.connect(self._rows_inserted)
+
+    def _block(self, rows):
+        """Сырые значения столбцов статистики для строк источника, (столбцы, строки)"""
+        source = self.proxy.sourceModel()
+        return np.stack([source.raw(col)[rows] for col in self._cols]).astype(
+            np.float64, copy=False)
+
+    def _publish(self):
+        for i, col in enumerate(self._cols):
+            if self._count:
+                self._stats[col] = (
+                    float(self._mean[i]), float(self._m2[i] / self._count))
             else:
                 self._stats[col] = (None, None)
+        if self._cols:
+            self.dataChanged.emit(
+                self.index(0, 0), self.index(1, len(self._cols) - 1))
+
+    def query_stats(self, where, sums=None):
+        """Статистика выборки where средствами БД: (число строк, средние,
+        суммы квадратов отклонений). Не трогает модель, так что её можно
+        считать вне GUI-потока и передать в setStats"""
+        from . import stats  # stats импортирует этот модуль
+
+        if sums is None:
+            sums = stats.research_only(where)
+        aggregate = stats.aggregate_stats if sums else aggregate_stats
+        with Session() as session:
+            return aggregate(session, [COLUMNS[col] for col in self._cols], *where)
+
+    def setStats(self, result):
+        """Публикует статистику query_stats по всей выборке источника"""
+        self._from_sql = True
+        self._count, self._mean, self._m2 = result
+        self._publish()
+
+    @metrics.timed('updateStats')
+    def updateStats(self):
+        """Пересчитывает статистику по принятым прокси строкам"""
+        from . import stats  # stats импортирует этот модуль
+
+        source = self.proxy.sourceModel()
+        # Фильтры перенесены в запрос модели (source.where)
+        self._from_sql = source.canFetchMore()
+        # Отбор только по экспериментам - хватает сумм из research_stats
+        use_sums = (
+            (self._from_sql or not self.proxy.has_filters())
+            and stats.research_only(source.where))
+        rows = self.proxy.source_rows()
+        if self._from_sql or use_sums:
+            result = self.query_stats(source.where, use_sums)
+            # В загруженной таблице ещё нет кадров, записанных после выборки
+            if self._from_sql or result[0] == len(rows):
+                self._count, self._mean, self._m2 = result
+                self._publish()
+                return
+        self._count = len(rows)
+        if self._count:
+            block = self._block(rows)
+            self._mean = block.mean(axis=1)
+            self._m2 = ((block - self._mean[:, None]) ** 2).sum(axis=1)
+        else:
+            self._mean = self._m2 = np.zeros(len(self._cols))
+        self._publish()
 
-        self.beginResetModel()
-        self.endResetModel()
+    def _rows_inserted(self, parent, first, last):
+        """Вливает в накопители только добавленные и принятые фильтром строки"""
+        if self._from_sql and self.proxy.sourceModel().fetching:
+            return  # подгруженная страница уже учтена в статистике из БД
+        rows = self.proxy.accepted_rows(first, last + 1)
+        if not len(rows):
+            return
+        block = self._block(rows)
+        n = len(rows)
+        mean = block.mean(axis=1)
+        m2 = ((block - mean[:, None]) ** 2).sum(axis=1)
+        total = self._count + n
+        delta = mean - self._mean
+        self._mean = self._mean + delta * n / total
+        self._m2 = self._m2 + m2 + delta ** 2 * self._count * n / total
+        self._count = total
+        self._publish()
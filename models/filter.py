@@ -1,80 +1,389 @@
-from datetime import datetime, time
-from PySide6.QtCore import QSortFilterProxyModel, Qt
+import time
+from datetime import datetime
+import numpy as np
+from PySide6.QtCore import (
+    QAbstractProxyModel, QModelIndex, QObject, QTimer, Qt, Signal)
+
+import config
+import metrics
 from .users import DATE_FORMAT
 from .entries import TIME_FORMAT
 
 
-class FilterProxyModel(QSortFilterProxyModel):
+def parse_bound(kind, text):
+    """Граница диапазона в тех же единицах, что и сырые значения столбца"""
+    if kind == 'time':
+        t = datetime.strptime(text, TIME_FORMAT)
+        return t.hour * 3600 + t.minute * 60 + t.second
+    if kind == 'date':
+        return datetime.strptime(text, DATE_FORMAT).toordinal()
+    return float(text)
+
+
+def combo_predicate(kind, text):
+    """Предикат точного совпадения со значением из QComboBox"""
+    if kind in ('int', 'float'):
+        try:
+            value = float(text)
+        except ValueError:
+            return lambda values: np.zeros(len(values), bool)
+        if kind == 'float':  # в таблице показаны значения с 3 знаками
+            return lambda values: np.round(values, 3) == value
+        return lambda values: values == value
+    return lambda values: values == text
+
+
+def range_predicate(kind, min_text, max_text):
+    """Предикат диапазона; None, если границы не разбираются"""
+    try:
+        low = None if min_text is None else parse_bound(kind, min_text)
+        high = None if max_text is None else parse_bound(kind, max_text)
+    except ValueError:
+        return None  # как и раньше, нераспознанный фильтр игнорируется
+    if low is None and high is None:
+        return None
+    if kind == 'time' and high is not None:
+        high += 1  # сравниваем с точностью до секунды, как в таблице
+
+    def predicate(values):
+        mask = np.ones(len(values), bool)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values < high if kind == 'time' else values <= high
+        return mask
+    return predicate
+
+
+def compile_filters(columns, kinds, combo_filters, range_filters, values_filters=None):
+    """Превращает состояние фильтров в список (столбец, предикат)"""
+    predicates = []
+    for column_name, values in (values_filters or {}).items():
+        if column_name in columns:
+            predicates.append((
+                columns.index(column_name),
+                lambda column_values, values=values: np.isin(column_values, values)))
+    for column_name, value in combo_filters.items():
+        if value and column_name in columns:
+            column = columns.index(column_name)
+            predicates.append((column, combo_predicate(kinds[column], value)))
+    for column, (min_value, max_value) in range_filters.items():
+        if kinds[column] == 'str':
+            continue
+        predicate = range_predicate(kinds[column], min_value, max_value)
+        if predicate is not None:
+            predicates.append((column, predicate))
+    return predicates
+
+
+def filter_mask(model, predicates, start=0, stop=None):
+    """Булева маска принятых строк источника в диапазоне [start, stop)"""
+    stop = model.rowCount() if stop is None else stop
+    mask = np.ones(stop - start, bool)
+    for column, predicate in predicates:
+        mask &= predicate(model.raw(column)[start:stop])
+    return mask
+
+
+def descending(rows, keys):
+    """Обращает строки, отсортированные устойчиво по возрастанию keys, так,
+    что равные ключи остаются в порядке возрастания строк"""
+    rows, keys = rows[::-1], keys[::-1]
+    same = keys[1:] == keys[:-1]
+    if keys.dtype.kind == 'f':
+        same |= np.isnan(keys[1:]) & np.isnan(keys[:-1])
+    if not same.any():
+        return rows
+    starts = np.flatnonzero(np.r_[True, ~same])
+    ends = np.r_[starts[1:], len(rows)]
+    run = np.repeat(np.arange(len(starts)), ends - starts)
+    # позиция i в серии [s, e) переходит на s + e - 1 - i
+    return rows[starts[run] + ends[run] - 1 - np.arange(len(rows))]
+
+
+class SortOrders:
+    """Устойчивые перестановки сортировки всех строк источника по столбцам.
+
+    Перестановка столбца считается один раз; строки, добавленные в конец
+    источника, вливаются в неё бинарным поиском без пересортировки.
+    Сброс или изменение данных источника очищают кэш (clear).
+    """
+    def __init__(self):
+        self._orders = {}  # столбец: (перестановка, значения в её порядке)
+
+    def clear(self):
+        self._orders.clear()
+
+    def order(self, column, values):
+        """Перестановка, сортирующая values по возрастанию"""
+        perm, keys = self._orders.get(column, (None, None))
+        n = 0 if perm is None or len(perm) > len(values) else len(perm)
+        if n == len(values) and perm is not None:
+            return perm
+        new = values[n:]
+        new_order = np.argsort(new, kind='stable')
+        new_keys = new[new_order]
+        if n:
+            # равные значения новых строк встают после старых
+            pos = np.searchsorted(keys, new_keys, side='right')
+            perm = np.insert(perm, pos, new_order + n)
+            keys = np.insert(keys, pos, new_keys)
+        else:
+            perm, keys = new_order, new_keys
+        self._orders[column] = perm, keys
+        return perm
+
+
+class FilterProxyModel(QAbstractProxyModel):
+    """Фильтрация и сортировка по сырым значениям столбцов источника.
+
+    Видимые строки хранятся массивом номеров строк источника, поэтому
+    перефильтрация - это одна векторная маска, а не вызов на каждую строку.
+    """
     def __init__(self, columns, parent=None):
         super().__init__(parent)
         self.columns = columns
         self.combo_filters = {}
         self.range_filters = {}
+        self.values_filters = {}  # столбец: допустимые значения (из другой таблицы)
+        self._predicates = []
+        self.dirty = False  # фильтры изменены, но ещё не применены
+        self._epoch = 0  # номер перефильтрации, прерывает устаревшую пошаговую
+        self._moved = 0  # вставок в середину источника, сдвигавших номера строк
+        self._rows = np.empty(0, np.int64)  # строки источника в порядке прокси
+        self._inverse = None
+        self._sort_column, self._sort_order = -1, Qt.AscendingOrder
+        self._orders = SortOrders()
+
+    def setSourceModel(self, model):
+        self.beginResetModel()
+        self._orders.clear()
+        old = self.sourceModel()
+        if old is not None:
+            old.rowsInserted.disconnect(self._source_rows_inserted)
+            old.modelAboutToBeReset.disconnect(self.beginResetModel)
+            old.modelReset.disconnect(self._source_reset)
+            old.dataChanged.disconnect(self._source_data_changed)
+        super().setSourceModel(model)
+        model.rowsInserted.connect(self._source_rows_inserted)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._source_reset)
+        model.dataChanged.connect(self._source_data_changed)
+        self._set_rows(self._sorted(self._accepted()))
+        self.endResetModel()
 
-    def set_combo_filter(self, column_name, value):
+    # С invalidate=False фильтр только запоминается (см. FilterScheduler)
+    def set_combo_filter(self, column_name, value, invalidate=True):
         self.combo_filters[column_name] = value
-        self.invalidateFilter()
+        self._changed(invalidate)
 
-    def clear_combo_filters(self):
+    def clear_combo_filters(self, invalidate=True):
         self.combo_filters.clear()
-        self.invalidateFilter()
+        self._changed(invalidate)
 
-    def set_range_filter(self, column, min_value=None, max_value=None):
+    def set_range_filter(self, column, min_value=None, max_value=None, invalidate=True):
         self.range_filters[column] = (min_value, max_value)
+        self._changed(invalidate)
+
+    def set_values_filter(self, column_name, values=None, invalidate=True):
+        """Оставляет строки, где значение столбца входит в values (None - сброс)"""
+        current = self.values_filters.get(column_name)
+        if values is None:
+            if current is None:
+                return
+            del self.values_filters[column_name]
+        elif current is not None and np.array_equal(current, values):
+            return
+        else:
+            self.values_filters[column_name] = values
+        self._changed(invalidate)
+
+    def _changed(self, invalidate):
+        if invalidate:
+            self.invalidateFilter()
+        else:
+            self.dirty = True
+
+    @metrics.timed('filter.invalidate')
+    def invalidateFilter(self):
+        self._relayout(self._sorted(self._accepted()))
+
+    def refilter_steps(self, chunk_size=None):
+        """Перефильтрация порциями строк: генератор, между шагами которого
+        интерфейс может обрабатывать события"""
+        chunk_size = chunk_size or config.FILTER_CHUNK
+        model = self.sourceModel()
+        epoch = self._epoch = self._epoch + 1
+        self.dirty = False
+        self._predicates = compile_filters(
+            self.columns, model.kinds, self.combo_filters, self.range_filters,
+            self.values_filters)
+        n = model.rowCount()
+        moved = self._moved
+        parts = []
+        for start in range(0, n, chunk_size):
+            yield
+            if epoch != self._epoch:
+                return  # фильтр уже применён заново
+            parts.append(self.accepted_rows(start, min(start + chunk_size, n)))
+        if moved != self._moved:
+            # в середину источника вставили страницу, и номера уже
+            # отобранных строк сдвинулись: проще отобрать всё заново
+            parts = [self.accepted_rows(0, model.rowCount())]
+        else:
+            # строки, добавленные в конец источника за время перефильтрации
+            parts.append(self.accepted_rows(n, model.rowCount()))
+        self._relayout(self._sorted(np.concatenate(parts)))
+
+    def has_filters(self):
+        return bool(self._predicates)
+
+    def source_rows(self):
+        """Номера принятых строк источника в порядке отображения"""
+        return self._rows
+
+    def _accepted(self, start=0, stop=None):
+        model = self.sourceModel()
+        if model is None:
+            return np.empty(0, np.int64)
+        self._epoch += 1
+        self.dirty = False
+        self._predicates = compile_filters(
+            self.columns, model.kinds, self.combo_filters, self.range_filters,
+            self.values_filters)
+        mask = filter_mask(model, self._predicates, start, stop)
+        return np.flatnonzero(mask) + start
+
+    def _sorted(self, rows):
+        if self._sort_column < 0 or not len(rows):
+            return rows
+        values = self.sourceModel().raw(self._sort_column)
+        if len(rows) < len(values) // 16:  # малую выборку дешевле отсортировать
+            rows = np.sort(rows)
+            rows = rows[np.argsort(values[rows], kind='stable')]
+        else:
+            perm = self._orders.order(self._sort_column, values)
+            accepted = np.zeros(len(values), bool)
+            accepted[rows] = True
+            rows = perm[accepted[perm]]
+        if self._sort_order == Qt.DescendingOrder:
+            rows = descending(rows, values[rows])
+        return rows
+
+    def _set_rows(self, rows):
+        self._rows = rows
+        self._inverse = None
+
+    def _relayout(self, rows):
+        """Заменяет набор строк, сохраняя выделение и текущую строку"""
+        self.layoutAboutToBeChanged.emit()
+        old = self.persistentIndexList()
+        sources = [self.mapToSource(i) for i in old]
+        self._set_rows(rows)
+        self.changePersistentIndexList(
+            old, [self.mapFromSource(i) for i in sources])
+        self.layoutChanged.emit()
+
+    def accepted_rows(self, start, stop):
+        """Строки источника из [start, stop), проходящие текущие фильтры"""
+        mask = filter_mask(self.sourceModel(), self._predicates, start, stop)
+        return np.flatnonzero(mask) + start
+
+    def _source_rows_inserted(self, parent, first, last):
+        count = last - first + 1
+        if first + count < self.sourceModel().rowCount():
+            # страница вставлена перед добавленными напрямую строками
+            self._moved += 1
+            self._orders.clear()
+            self._set_rows(np.where(
+                self._rows >= first, self._rows + count, self._rows))
+        new_rows = self.accepted_rows(first, last + 1)
+        if not len(new_rows):
+            return
+        if self._sort_column < 0:
+            # строки прокси идут по возрастанию номеров строк источника
+            pos = int(np.searchsorted(self._rows, first))
+            self.beginInsertRows(QModelIndex(), pos, pos + len(new_rows) - 1)
+            self._set_rows(np.concatenate(
+                (self._rows[:pos], new_rows, self._rows[pos:])))
+            self.endInsertRows()
+        else:
+            self._relayout(self._sorted(np.concatenate((self._rows, new_rows))))
+
+    def _source_reset(self):
+        self._orders.clear()
+        self._set_rows(self._sorted(self._accepted()))
+        self.endResetModel()
+
+    def _source_data_changed(self, *args):
+        self._orders.clear()
         self.invalidateFilter()
-    
-    def cmp(self, value, min_value, max_value, transform_func):
-        value = transform_func(value)
-        if min_value is not None and value < transform_func(min_value):
-            return False
-        if max_value is not None and value > transform_func(max_value):
-            return False
-        return True
-
-    def filterAcceptsRow(self, source_row, source_parent):
-        # Фильтры QComboBox (точное соответствие)
-        for column_name, value in self.combo_filters.items():
-            if value:
-                index = self.sourceModel().index(source_row, self.columns.index(column_name), source_parent)
-                try:
-                    i = self.sourceModel().data(index)
-                    if value.isdigit():
-                        value = float(value)
-                        i = float(self.sourceModel().data(index))
-                    if value != i:
-                        return False
-                except ValueError:
-                    return False
-        accept = True
-        # Фильтры QLineEdit (диапазон значений)
-        for column, (min_value, max_value) in self.range_filters.items():
-            index = self.sourceModel().index(source_row, column, source_parent)
-            value = self.sourceModel().data(index, Qt.DisplayRole)
-            if not isinstance(value, str):
-                try:
-                    accept &= self.cmp(value, min_value, max_value, float)
-                except ValueError:
-                    pass  # Игнорируем ошибки преобразования, если фильтр установлен
-                continue
-
-            f = None
-            if ':' in value:
-                f = TIME_FORMAT
-            elif value.count('.') > 1:
-                f = DATE_FORMAT
-            if f:
-                try:
-                    accept &= self.cmp(
-                        value, min_value, max_value, lambda x: datetime.strptime(x, f))
-                except ValueError:
-                    pass
-        return accept
-    
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_column, self._sort_order = column, order
+        # без сортировки - снова порядок источника
+        rows = self._rows if column >= 0 else np.sort(self._rows)
+        self._relayout(self._sorted(rows))
+
+    # Структура модели
+    def index(self, row, column, parent=QModelIndex()):
+        if (
+            parent.isValid() or not 0 <= row < len(self._rows)
+            or not 0 <= column < self.columnCount()
+        ):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        if index is None:
+            return QObject.parent(self)
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        model = self.sourceModel()
+        if parent.isValid() or model is None:
+            return 0
+        return model.columnCount()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(
+            int(self._rows[proxy_index.row()]), proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if self._inverse is None:
+            self._inverse = np.full(self.sourceModel().rowCount(), -1, np.int64)
+            self._inverse[self._rows] = np.arange(len(self._rows))
+        row = source_index.row()
+        if row >= len(self._inverse) or self._inverse[row] < 0:
+            return QModelIndex()
+        return self.createIndex(int(self._inverse[row]), source_index.column())
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        model = self.sourceModel()
+        return model.data(
+            model.index(int(self._rows[index.row()]), index.column()), role)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal:
+            return self.sourceModel().headerData(section, orientation, role)
+        if role == Qt.DisplayRole:
+            return section + 1
+        return None
+
     def data_generator(self, yield_by_cols=False):
         n1, n2 = self.rowCount(), self.columnCount()
         if yield_by_cols:
             n1, n2 = n2, n1
-            
+
         for i in range(n1):
             values = []
             for j in range(n2):
@@ -82,4 +391,60 @@ class FilterProxyModel(QSortFilterProxyModel):
                 idx = self.index(*loc)
                 v = self.data(idx, Qt.DisplayRole)
                 values.append(v)
-            yield values
\ No newline at end of file
+            yield values
+
+
+class FilterScheduler(QObject):
+    """Откладывает и объединяет правки фильтров.
+
+    Правки из комбобоксов и полей диапазона только запоминаются в прокси;
+    после паузы в delay мс выполняется одна перефильтрация каждой
+    изменённой модели (порциями, не блокируя интерфейс) и один сигнал
+    applied для пересчёта статистики.
+    """
+    applied = Signal()
+
+    def __init__(self, proxies, prepare=None, delay=None, chunk_size=None, parent=None):
+        super().__init__(parent)
+        self.proxies = proxies
+        self.prepare = prepare  # вызывается перед перефильтрацией
+        self.chunk_size = chunk_size
+        self._steps = []  # (прокси, генератор refilter_steps) по очереди
+        self._started = 0.0
+        self._timer = QTimer(self, singleShot=True)
+        self._timer.setInterval(config.FILTER_DELAY if delay is None else delay)
+        self._timer.timeout.connect(self._apply)
+        self._step_timer = QTimer(self)
+        self._step_timer.setInterval(0)
+        self._step_timer.timeout.connect(self._step)
+
+    def schedule(self):
+        """Откладывает применение фильтров на delay мс от последней правки"""
+        # Недоделанная перефильтрация бросается, и прокси снова помечается
+        # изменённой, иначе в нём останутся строки старого фильтра
+        for proxy, _ in self._steps:
+            proxy.dirty = True
+        self._steps = []
+        self._step_timer.stop()
+        self._timer.start()
+
+    def _apply(self):
+        self._started = time.perf_counter()
+        if self.prepare is not None:
+            self.prepare()
+        self._steps = [
+            (proxy, proxy.refilter_steps(self.chunk_size))
+            for proxy in self.proxies if proxy.dirty]
+        self._step_timer.start()
+
+    def _step(self):
+        while self._steps:
+            try:
+                next(self._steps[0][1])
+                return
+            except StopIteration:
+                self._steps.pop(0)
+        self._step_timer.stop()
+        if metrics.enabled():
+            metrics.record('filter.apply', time.perf_counter() - self._started)
+        self.applied.emit()
@@ -0,0 +1,104 @@
+import time
+from collections import namedtuple
+import numpy as np
+
+import config
+import metrics
+from . import Session, stats, samples
+from .columnar import ColumnStore
+from .entries import MUTABLE_COLUMNS, DTYPES
+
+# Пакет кадров по столбцам: research и times (секунды от полуночи) - (n,),
+# values - (n, столбцы MUTABLE_COLUMNS после time), samples - {канал:
+# отсчёты кадров, массив (n, k)}
+FrameBatch = namedtuple('FrameBatch', 'research times values samples')
+
+INSERT_ENTRIES = (
+    f'INSERT INTO entries ({", ".join(MUTABLE_COLUMNS)}) '
+    f'VALUES ({", ".join("?" * len(MUTABLE_COLUMNS))})')
+
+
+def time_strings(seconds):
+    """Секунды от полуночи в строки, как их хранит тип Time в SQLite"""
+    us = np.round(np.asarray(seconds) * 1e6).astype(np.int64)
+    s, us = np.divmod(us, 1_000_000)
+    return [
+        f'{h:02d}:{m:02d}:{sec:02d}.{u:06d}'
+        for h, m, sec, u in zip(
+            (s // 3600).tolist(), (s // 60 % 60).tolist(), (s % 60).tolist(),
+            us.tolist())]
+
+
+def concat_batches(batches):
+    if len(batches) == 1:
+        return batches[0]
+    # отсчёты пишутся, только если они есть у всех пакетов
+    channels = set.intersection(*(set(b.samples) for b in batches))
+    return FrameBatch(
+        np.concatenate([b.research for b in batches]),
+        np.concatenate([b.times for b in batches]),
+        np.concatenate([b.values for b in batches]),
+        {ch: np.concatenate([b.samples[ch] for b in batches]) for ch in channels})
+
+
+class FrameWriter:
+    """Копит кадры и записывает их пакетами, по одной транзакции на пакет.
+
+    После записи on_flush получает ColumnStore записанных кадров со
+    столбцами COLUMNS (время - в секундах от полуночи).
+    """
+    def __init__(self, batch_size=None, flush_interval=None, on_flush=None):
+        self.batch_size = batch_size or config.BATCH_SIZE
+        self.flush_interval = (
+            config.FLUSH_INTERVAL if flush_interval is None else flush_interval)
+        self.on_flush = on_flush
+        self.batches = []
+        self.pending = 0
+        self.written = 0
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def due(self):
+        """Пора записать накопленное по времени"""
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def add_batch(self, batch):
+        """Добавляет пакет кадров FrameBatch"""
+        if not len(batch.research):
+            return
+        self.batches.append(batch)
+        self.pending += len(batch.research)
+        if self.pending >= self.batch_size or self.due():
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленное одним executemany; возвращает ColumnStore
+        записанных кадров или None"""
+        self._last_flush = time.monotonic()
+        if not self.batches:
+            return None
+        batch = concat_batches(self.batches)
+        self.batches, self.pending = [], 0
+        n = len(batch.research)
+        with metrics.span('db.commit'), Session.begin() as session:
+            conn = session.connection()
+            conn.exec_driver_sql(INSERT_ENTRIES, list(zip(
+                batch.research.tolist(), time_strings(batch.times),
+                *batch.values.T.tolist())))
+            # Транзакция держит блокировку записи, а rowid без AUTOINCREMENT
+            # выдаются как max + 1, так что id пакета идут подряд
+            last = conn.exec_driver_sql('SELECT last_insert_rowid()').scalar()
+            ids = np.arange(last - n + 1, last + 1, dtype=np.int64)
+            stats.accumulate(session, batch.research, batch.values)
+            samples.write(conn, ids, batch.samples)
+        store = ColumnStore(DTYPES, n)
+        store.append_columns([ids, batch.research, batch.times, *batch.values.T])
+        self.written += n
+        if self.on_flush is not None:
+            self.on_flush(store)
+        return store
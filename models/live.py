@@ -0,0 +1,40 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+import numpy as np
+
+from .entries import HEADERS, format_time
+
+HEADERS = HEADERS[2:]  # время и значения кадра
+
+
+class LiveFramesModel(QAbstractTableModel):
+    """Последние кадры непрерывной съёмки (из памяти, без запросов к БД),
+    новые - сверху"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._times = np.empty(0)
+        self._values = np.empty((0, len(HEADERS) - 1))
+
+    def set_frames(self, times, values):
+        self.beginResetModel()
+        self._times = times[::-1]
+        self._values = values[::-1]
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self._times)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row, col = index.row(), index.column()
+        if col == 0:
+            return format_time(self._times[row])
+        return round(float(self._values[row, col - 1]), 3)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
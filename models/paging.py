@@ -0,0 +1,113 @@
+from PySide6.QtCore import Qt, QModelIndex
+
+import config
+
+# Роль данных с типизированным значением ячейки (как raw()) для сортировки:
+# время - секунды от полуночи, дата - порядковый номер дня
+SORT_ROLE = Qt.UserRole
+
+
+def where_key(where):
+    """Ключ для сравнения наборов условий WHERE"""
+    return [(str(c), c.compile().params) for c in where]
+
+
+class KeysetPager:
+    """Курсор постраничной загрузки по возрастающему ключу (keyset pagination)"""
+    def __init__(self, key, page_size=None):
+        self.key = key
+        self.page_size = page_size or config.PAGE_SIZE
+        self.last = None  # последний загруженный ключ
+        self.count = 0  # строк загружено страницами
+        self.stop = None  # строки с ключом от stop добавлены в модель напрямую
+        self.complete = False
+
+    def where(self):
+        """Условия следующей страницы"""
+        clauses = []
+        if self.last is not None:
+            clauses.append(self.key > self.last)
+        if self.stop is not None:
+            clauses.append(self.key < self.stop)
+        return clauses
+
+    def advance(self, keys):
+        """Сдвигает курсор по ключам загруженной страницы"""
+        if len(keys):
+            self.last = int(keys[-1])
+            self.count += len(keys)
+        if len(keys) < self.page_size:
+            self.complete = True
+
+    def hold(self, key):
+        """Отмечает, что строки начиная с key добавлены в обход пагинации"""
+        if not self.complete and self.stop is None:
+            self.stop = key
+
+
+class PagedModelMixin:
+    """Постраничная подгрузка строк табличной модели из БД.
+
+    Модель задаёт key (столбец ключа), _load_page() -> (страница, ключи),
+    _insert(строка, страница) и _clear(). Строки, добавленные в обход
+    пагинации (pager.hold), идут после всех страниц: следующая страница
+    вставляется перед ними, так что строки остаются упорядочены по ключу.
+    """
+    key = None
+
+    def init_paging(self, where=(), loaded=False):
+        self.where = list(where)
+        self.pager = KeysetPager(self.key)
+        self.pager.complete = loaded
+        self.fetching = False  # идёт подгрузка страницы, а не добавление новых строк
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.pager.complete
+
+    def started(self):
+        """Загружена хотя бы одна страница или модель заполнена сразу"""
+        return self.pager.last is not None or self.pager.complete
+
+    def load_page(self):
+        """Читает следующую страницу, не меняя модель; можно вызывать вне
+        GUI-потока, а результат передать в insert_page"""
+        return self._load_page()
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self.insert_page(*self._load_page())
+
+    def insert_page(self, page, keys):
+        """Добавляет в модель страницу, прочитанную load_page"""
+        first = self.pager.count
+        self.pager.advance(keys)
+        if not len(keys):
+            return
+        self.fetching = True
+        self.beginInsertRows(QModelIndex(), first, first + len(keys) - 1)
+        self._insert(first, page)
+        self.endInsertRows()
+        self.fetching = False
+
+    def fetch_all(self):
+        while self.canFetchMore():
+            self.fetchMore()
+
+    def set_where(self, where):
+        """Перезагружает модель с новыми условиями выборки"""
+        if where_key(where) == where_key(self.where):
+            return
+        self.beginResetModel()
+        self._clear()
+        self.init_paging(where)
+        page, keys = self._load_page()
+        self.pager.advance(keys)
+        self._insert(0, page)
+        self.endResetModel()
+
+    def push_down(self, where):
+        """Переносит фильтры в запрос, если таблица загружена не целиком"""
+        if self.pager.complete and not self.where:
+            return  # всё уже в памяти, фильтрует прокси
+        self.set_where(where)
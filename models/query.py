@@ -0,0 +1,90 @@
+from datetime import date
+from sqlalchemy import select, func, false
+import numpy as np
+
+from . import users, entries
+from .filter import parse_bound
+
+
+def column_expr(table, name, kind):
+    # время сравнивается с самим столбцом Time (строка 'ЧЧ:ММ:СС.ffffff'
+    # с нулями впереди), иначе SQLite не может использовать индекс
+    return getattr(table, name)
+
+
+def bound_value(kind, text):
+    """Граница диапазона в виде, сравнимом со столбцом в SQL"""
+    value = parse_bound(kind, text)
+    if kind == 'date':
+        return date.fromordinal(value)
+    return value
+
+
+def filter_clauses(table, columns, kinds, combo_filters, range_filters):
+    """Условия WHERE, эквивалентные фильтрам FilterProxyModel"""
+    clauses = []
+    for column_name, value in combo_filters.items():
+        if not value or column_name not in columns:
+            continue
+        kind = kinds[columns.index(column_name)]
+        col = column_expr(table, column_name, kind)
+        if kind in ('int', 'float'):
+            try:
+                number = float(value)
+            except ValueError:
+                clauses.append(false())
+                continue
+            if kind == 'float':  # в таблице показаны значения с 3 знаками
+                col = func.round(col, 3)
+            clauses.append(col == number)
+        else:
+            clauses.append(col == value)
+    for column, (min_value, max_value) in range_filters.items():
+        kind = kinds[column]
+        if kind == 'str':
+            continue
+        try:
+            low = None if min_value is None else bound_value(kind, min_value)
+            high = None if max_value is None else bound_value(kind, max_value)
+        except ValueError:
+            continue  # нераспознанный фильтр игнорируется, как и в таблице
+        col = column_expr(table, columns[column], kind)
+        if kind == 'time' and low is not None:
+            low = entries.seconds_to_time(low)
+        if low is not None:
+            clauses.append(col >= low)
+        if high is None:
+            continue
+        if kind == 'time':
+            # с точностью до секунды: до начала следующей секунды, а после
+            # 23:59:59 граница уже ничего не отсекает
+            if high + 1 < 24 * 3600:
+                clauses.append(col < entries.seconds_to_time(high + 1))
+        else:
+            clauses.append(col <= high)
+    return clauses
+
+
+def build_where(user_proxy, entry_proxy):
+    """Условия выборки пользователей и кадров по состоянию фильтров.
+
+    Фильтры таблицы пользователей распространяются на кадры через
+    соединение по номеру эксперимента.
+    """
+    user_where = filter_clauses(
+        users.User, users.COLUMNS, users.KINDS,
+        user_proxy.combo_filters, user_proxy.range_filters)
+    entry_where = filter_clauses(
+        entries.Entries, entries.COLUMNS, entries.KINDS,
+        entry_proxy.combo_filters, entry_proxy.range_filters)
+    if user_where:
+        entry_where.append(entries.Entries.research.in_(
+            select(users.User.research).where(*user_where)))
+    return user_where, entry_where
+
+
+def researches(session, user_where):
+    """Номера экспериментов, удовлетворяющих условиям на пользователей"""
+    result = session.execute(select(users.User.research).where(*user_where))
+    return np.fromiter(result.scalars(), np.int64)
+
@@ -0,0 +1,47 @@
+import numpy as np
+from sqlalchemy import Column, Integer, String, LargeBinary, ForeignKey, select
+
+import config
+from . import Base
+
+
+class MvSamples(Base):
+    """Исходные отсчёты многократно читаемого канала (config.MV_CHANNELS)
+    одного кадра: массив NumPy в бинарном виде"""
+    __tablename__ = "mv_samples"
+
+    entry_id = Column(Integer, ForeignKey('entries.id'), primary_key=True)
+    channel = Column(Integer, primary_key=True)
+    dtype = Column(String, nullable=False)  # строка np.dtype.str, например '<f8'
+    samples = Column(LargeBinary, nullable=False)
+
+
+def write(conn, ids, samples):
+    """Записывает отсчёты пакета кадров: ids - id кадров, samples - {канал:
+    массив (кадры, отсчёты)}"""
+    dtype = np.dtype(config.MV_SAMPLE_DTYPE)
+    rows = [
+        (id_, ch, dtype.str, values.tobytes())
+        for ch, block in samples.items()
+        for id_, values in zip(ids.tolist(), np.asarray(block, dtype))]
+    if rows:
+        conn.exec_driver_sql(
+            'INSERT INTO mv_samples (entry_id, channel, dtype, samples) '
+            'VALUES (?, ?, ?, ?)', rows)
+
+
+def load(session, channel, *where):
+    """id кадров и отсчёты канала: двумерный массив (кадры, отсчёты), если
+    у всех кадров одинаковые число и тип отсчётов, иначе список массивов"""
+    rows = session.execute(
+        select(MvSamples.entry_id, MvSamples.dtype, MvSamples.samples)
+        .where(MvSamples.channel == channel, *where)
+        .order_by(MvSamples.entry_id)).all()
+    ids = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+    dtypes = {row[1] for row in rows}
+    sizes = {len(row[2]) for row in rows}
+    if len(dtypes) == 1 and len(sizes) == 1:
+        dtype = np.dtype(dtypes.pop())
+        data = np.frombuffer(b''.join(row[2] for row in rows), dtype)
+        return ids, data.reshape(len(rows), sizes.pop() // dtype.itemsize)
+    return ids, [np.frombuffer(row[2], row[1]) for row in rows]
@@ -0,0 +1,115 @@
+import logging
+from sqlalchemy import inspect
+
+from . import Base, stats, samples
+
+logger = logging.getLogger('measuring')
+
+# Настройки SQLite для каждого соединения. WAL позволяет читать таблицы
+# из интерфейса, не блокируя запись кадров из потока съёмки.
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # в режиме WAL надёжно и без fsync на каждую транзакцию
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000,  # мс
+    'cache_size': -64000,  # КиБ
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+INDEXED = {
+    'entries': ['research', 'time', 'temperature', 'pressure', 'humidity'],
+    'users': ['date', 'user'],
+}
+
+
+def set_pragmas(dbapi_connection, connection_record):
+    """Обработчик connect движка (init_db): PRAGMAS для нового соединения"""
+    cursor = dbapi_connection.cursor()
+    for name, value in PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def add_entries_foreign_key(conn):
+    """entries.research ссылается на users.research (пересоздание таблицы)"""
+    conn.exec_driver_sql('ALTER TABLE entries RENAME TO entries_old')
+    conn.exec_driver_sql('''
+        CREATE TABLE entries (
+            id INTEGER NOT NULL PRIMARY KEY,
+            research INTEGER REFERENCES users (research),
+            time TIME,
+            temperature FLOAT NOT NULL,
+            pressure FLOAT NOT NULL,
+            humidity FLOAT NOT NULL,
+            sensor4 FLOAT NOT NULL,
+            sensor5 FLOAT NOT NULL,
+            sensor6_mean FLOAT NOT NULL,
+            sensor6_var FLOAT NOT NULL,
+            observation20 FLOAT NOT NULL,
+            observation43 FLOAT NOT NULL,
+            observation58 FLOAT NOT NULL
+        )''')
+    conn.exec_driver_sql('INSERT INTO entries SELECT * FROM entries_old')
+    conn.exec_driver_sql('DROP TABLE entries_old')
+
+
+def add_indexes(conn):
+    """Индексы по эксперименту, времени и часто фильтруемым столбцам"""
+    for table, columns in INDEXED.items():
+        for column in columns:
+            conn.exec_driver_sql(
+                f'CREATE INDEX IF NOT EXISTS ix_{table}_{column} '
+                f'ON {table} ({column})')
+
+
+def add_research_stats(conn):
+    """Таблица сумм по экспериментам research_stats"""
+    stats.ResearchStats.__table__.create(conn)
+    stats.rebuild(conn)
+
+
+def add_mv_samples(conn):
+    """Таблица исходных отсчётов многократно читаемых каналов mv_samples"""
+    samples.MvSamples.__table__.create(conn)
+
+
+# Миграция i переводит схему из версии i в i + 1 (PRAGMA user_version)
+MIGRATIONS = [
+    add_entries_foreign_key,
+    add_indexes,
+    add_research_stats,
+    add_mv_samples,
+]
+VERSION = len(MIGRATIONS)
+
+
+def upgrade(engine):
+    """Создаёт схему или обновляет существующую БД до текущей версии"""
+    with engine.connect() as conn:
+        # Пересоздание таблиц невозможно при включённых внешних ключах,
+        # а переключать их можно только вне транзакции
+        conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        conn.commit()
+        try:
+            with conn.begin():
+                # pysqlite сам не открывает транзакцию перед DDL
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+                version = conn.exec_driver_sql('PRAGMA user_version').scalar()
+                if version == 0 and not inspect(conn).has_table('entries'):
+                    Base.metadata.create_all(conn)
+                    version = VERSION
+                for i in range(version, VERSION):
+                    logger.info(
+                        f'Обновление схемы БД до версии {i + 1}: '
+                        f'{MIGRATIONS[i].__doc__ or MIGRATIONS[i].__name__}')
+                    MIGRATIONS[i](conn)
+                conn.exec_driver_sql(f'PRAGMA user_version={VERSION}')
+                problems = conn.exec_driver_sql(
+                    'PRAGMA foreign_key_check').fetchall()
+                if problems:
+                    logger.warning(
+                        f'В БД {len(problems)} кадров без записи в users')
+        finally:
+            conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+            conn.commit()
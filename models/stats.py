@@ -0,0 +1,104 @@
+import numpy as np
+from sqlalchemy import (
+    Column, Integer, Float, String, ForeignKey, select, func, literal, insert, delete)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.expression import ColumnClause
+
+from . import Base
+from .entries import Entries, MUTABLE_COLUMNS
+
+NUMERIC_COLUMNS = MUTABLE_COLUMNS[2:]  # без research и time
+
+
+class ResearchStats(Base):
+    """Суммы по столбцам кадров каждого эксперимента"""
+    __tablename__ = "research_stats"
+
+    research = Column(
+        Integer, ForeignKey('users.research'), primary_key=True, autoincrement=False)
+    column = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+    sum = Column(Float, nullable=False)
+    sumsq = Column(Float, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+
+
+def accumulate(session, research, values):
+    """Добавляет к суммам пакет кадров в текущей транзакции: номера
+    экспериментов (n,) и значения столбцов NUMERIC_COLUMNS (n, столбцы)"""
+    params = []
+    for r in np.unique(research):
+        block = values[research == r]
+        params += [
+            dict(research=int(r), column=name, count=len(block),
+                 sum=s, sumsq=q, min=lo, max=hi)
+            for name, s, q, lo, hi in zip(
+                NUMERIC_COLUMNS, block.sum(axis=0).tolist(),
+                (block * block).sum(axis=0).tolist(),
+                block.min(axis=0).tolist(), block.max(axis=0).tolist())]
+    stmt = sqlite_insert(ResearchStats)
+    new = stmt.excluded
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[ResearchStats.research, ResearchStats.column],
+        set_={
+            'count': ResearchStats.count + new['count'],
+            'sum': ResearchStats.sum + new['sum'],
+            'sumsq': ResearchStats.sumsq + new['sumsq'],
+            'min': func.min(ResearchStats.min, new['min']),
+            'max': func.max(ResearchStats.max, new['max']),
+        }), params)
+
+
+def rebuild(conn):
+    """Пересчитывает research_stats по всей таблице entries"""
+    table, entries = ResearchStats.__table__, Entries.__table__
+    conn.execute(delete(table))
+    for name in NUMERIC_COLUMNS:
+        col = entries.c[name]
+        conn.execute(insert(table).from_select(
+            ['research', 'column', 'count', 'sum', 'sumsq', 'min', 'max'],
+            select(
+                entries.c.research, literal(name), func.count(), func.sum(col),
+                func.sum(col * col), func.min(col), func.max(col),
+            ).where(entries.c.research.is_not(None)).group_by(entries.c.research)))
+
+
+def _entries_column(element):
+    if isinstance(element, ColumnClause) and element.table is Entries.__table__:
+        return element.key
+    return None
+
+
+def research_only(where):
+    """Условия отбирают кадры только по номеру эксперимента"""
+    return all(
+        _entries_column(element) in (None, 'research')
+        for clause in where for element in visitors.iterate(clause))
+
+
+def aggregate_stats(session, columns, *where):
+    """То же, что entries.aggregate_stats, по суммам research_stats.
+
+    where должны ссылаться из entries только на research (research_only).
+    """
+    table = ResearchStats.__table__
+    where = [
+        visitors.replacement_traverse(
+            clause, {},
+            lambda e: table.c.research if _entries_column(e) == 'research' else None)
+        for clause in where]
+    rows = session.execute(
+        select(table.c.column, func.sum(table.c.count),
+               func.sum(table.c.sum), func.sum(table.c.sumsq))
+        .where(table.c.column.in_(columns), *where)
+        .group_by(table.c.column)).all()
+    totals = {name: (count, s, q) for name, count, s, q in rows}
+    count = max((t[0] for t in totals.values()), default=0)
+    if not count:
+        return 0, np.zeros(len(columns)), np.zeros(len(columns))
+    s, q = np.array(
+        [totals.get(name, (0, 0.0, 0.0))[1:] for name in columns], np.float64).T
+    means = s / count
+    return count, means, np.maximum(q - s * means, 0.0)
@@ -1,25 +1,92 @@
-from sqlalchemy import Column, Integer, String, Date
-from PySide6.QtCore import Qt, QAbstractTableModel
-from . import Base
+from datetime import date
+import numpy as np
+from sqlalchemy import Column, Integer, String, Date, select, cast, func
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from . import Base, Session
+from .paging import PagedModelMixin, SORT_ROLE
 
 HEADERS = ["Эксперимент", "Дата (ДД.ММ.ГГГГ)", "Пользователь", 'Комментарий']
 COLUMNS = ['research', 'date', 'user', 'comment']
 MUTABLE_COLUMNS = ['date', 'user', 'comment']
 DATE_FORMAT = '%d.%m.%Y'
+KINDS = ['int', 'date', 'str', 'str']  # дата - порядковый номер дня
 
 class User(Base):
     __tablename__ = "users"
     
     research = Column(Integer, primary_key=True, autoincrement=True)
-    date = Column(Date, nullable=False)
-    user = Column(String, nullable=False)
+    date = Column(Date, nullable=False, index=True)
+    user = Column(String, nullable=False, index=True)
     comment = Column(String)
 
 
-class UserTableModel(QAbstractTableModel):
-    def __init__(self, users, parent=None):
+def create_research(username, comment):
+    """Записывает новый эксперимент с сегодняшней датой; возвращает User,
+    пригодный вне сессии"""
+    user = User(**dict(zip(MUTABLE_COLUMNS, [date.today(), username, comment])))
+    with Session(expire_on_commit=False) as session:
+        session.add(user)
+        session.commit()
+    return user
+
+
+class UserTableModel(PagedModelMixin, QAbstractTableModel):
+    """Эксперименты; без готового списка подгружаются из БД страницами"""
+    kinds = KINDS
+    key = User.__table__.c.research
+
+    def __init__(self, users=None, where=(), parent=None):
         super().__init__(parent)
+        self._raw = None
+        self.init_paging(where, loaded=users is not None)
         self.users = users
+        if users is None:
+            self.users = []
+            self.fetchMore()
+
+    def _load_page(self):
+        with Session() as session:
+            page = session.query(User).filter(
+                *self.where, *self.pager.where()).order_by(
+                    User.research).limit(self.pager.page_size).all()
+        return page, [u.research for u in page]
+
+    def _insert(self, row, page):
+        self.users[row:row] = page
+        self._raw = None
+
+    def _clear(self):
+        self.users = []
+        self._raw = None
+
+    def raw_select(self):
+        """Core-запрос всей выборки модели в единицах raw(), в обход страниц"""
+        # julianday('0001-01-01') = 1721425.5, а date.toordinal() для неё 1
+        ordinal = cast(func.julianday(User.date) - 1721424.5, Integer)
+        return select(User.research, ordinal, User.user, User.comment).where(
+            *self.where).order_by(User.research)
+
+    def append_rows(self, users):
+        """Добавляет в конец модели новые эксперименты"""
+        if not users:
+            return
+        self.pager.hold(users[0].research)
+        first = len(self.users)
+        self.beginInsertRows(QModelIndex(), first, first + len(users) - 1)
+        self.users.extend(users)
+        self._raw = None
+        self.endInsertRows()
+
+    def raw(self, column):
+        """Типизированные значения столбца (дата - порядковый номер дня)"""
+        if self._raw is None:
+            self._raw = [
+                np.fromiter((u.research for u in self.users), np.int64),
+                np.fromiter((u.date.toordinal() for u in self.users), np.int64),
+                np.array([u.user for u in self.users], object),
+                np.array([u.comment or '' for u in self.users], object),
+            ]
+        return self._raw[column]
 
     def rowCount(self, parent=None):
         return len(self.users)
@@ -28,6 +95,9 @@ class UserTableModel(QAbstractTableModel):
         return 4
 
     def data(self, index, role=Qt.DisplayRole):
+        if role == SORT_ROLE and index.isValid():
+            value = self.raw(index.column())[index.row()]
+            return value.item() if isinstance(value, np.generic) else value
         if not index.isValid() or role != Qt.DisplayRole:
             return None
 
@@ -0,0 +1,24 @@
+"""Установки, с которых снимаются кадры.
+
+Любая установка - объект с методом measure(ch), возвращающим значение
+канала (число). Атрибут concurrent_reads = True разрешает читать разные
+каналы одновременно из нескольких потоков.
+"""
+import os
+
+import config
+
+BACKENDS = ('hardware', 'simulator')
+
+
+def create_plant(backend=None):
+    """Создаёт установку по имени, переменной TTPOSU_PLANT или config"""
+    backend = backend or os.getenv('TTPOSU_PLANT') or config.PLANT_BACKEND
+    if backend == 'hardware':
+        import plantm  # собран только под Windows
+        return plantm.Plant()
+    if backend == 'simulator':
+        from .simulator import SimulatedPlant
+        return SimulatedPlant(**config.SIMULATOR)
+    raise ValueError(
+        f'Неизвестная установка {backend!r}, допустимы: {", ".join(BACKENDS)}')
@@ -0,0 +1,49 @@
+import threading
+import time
+import numpy as np
+
+import config
+
+
+class SimulatedPlant:
+    """Имитация установки для нагрузочных прогонов без оборудования.
+
+    Каналы config.BASE_CHANNELS и MV_CHANNELS дают шумящее значение
+    около середины диапазона из config.BORDERS (или DEFAULT_RANGE) с
+    линейным дрейфом; с вероятностью excursion_rate значение выходит за
+    границы. Каналы STABLE_CHANNELS постоянны, но с вероятностью
+    stability_fault_rate скачком меняются.
+    """
+    concurrent_reads = True
+    DEFAULT_RANGE = (0.0, 30.0)
+
+    def __init__(self, latency=0.0, noise=0.05, drift=0.0, excursion_rate=0.0,
+                 stability_fault_rate=0.0, seed=None):
+        self.latency = latency
+        self.noise = noise
+        self.drift = drift
+        self.excursion_rate = excursion_rate
+        self.stability_fault_rate = stability_fault_rate
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()  # Generator не потокобезопасен
+        self._start = time.monotonic()
+        self._stable = {ch: float(ch) for ch in config.STABLE_CHANNELS}
+
+    def measure(self, ch):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if ch in self._stable:
+                if self._rng.random() < self.stability_fault_rate:
+                    self._stable[ch] += 1.0
+                return self._stable[ch]
+            low, high = config.BORDERS.get(ch, self.DEFAULT_RANGE)
+            span = high - low
+            if self._rng.random() < self.excursion_rate:
+                return float(high + span * self._rng.uniform(0.01, 0.5))
+            elapsed = time.monotonic() - self._start
+            value = (
+                (low + high) / 2
+                + span * self.drift * elapsed
+                + span * self.noise * self._rng.standard_normal())
+            return float(value)
@@ -0,0 +1,74 @@
+"""Текст числовых столбцов CSV (export.text_parts/join_text)"""
+from datetime import date
+
+import numpy as np
+
+from export import _const, join_text, text_parts
+from models.entries import seconds_to_time
+
+
+def lines(kind, column):
+    """Текст ячеек столбца, по строке на значение"""
+    parts = [*text_parts(kind, column), _const(b'\n', len(column))]
+    return join_text(parts).tobytes().decode('ascii').splitlines()
+
+
+def test_floats_round_trip():
+    rng = np.random.default_rng(0)
+    special = [
+        0.0, -0.0, 1.0, -1.5, 0.1, 1 / 3, 2 ** 53, 2 ** 53 + 2, 1e15, 1e16,
+        1e300, -1e-300, 5e-324, 2.2250738585072014e-308, np.nan, np.inf,
+        -np.inf]
+    column = np.concatenate([
+        special,
+        rng.normal(15, 5, 1000).round(4),
+        rng.uniform(-1e6, 1e6, 1000),
+        # случайные битовые шаблоны: любые порядки и мантиссы
+        rng.integers(0, 2 ** 63, 1000, dtype=np.int64).view(np.float64),
+    ])
+    column = np.concatenate([column, -column])
+    texts = lines('float', column)
+    assert len(texts) == len(column)
+    for value, text in zip(column, texts):
+        parsed = float(text)
+        if np.isnan(value):
+            assert np.isnan(parsed), text
+        else:
+            assert parsed == value and np.signbit(parsed) == np.signbit(value), text
+
+
+def test_short_decimals():
+    assert lines('float', np.array([15.1234, -0.5, 3.0, 100.0])) == [
+        '15.1234', '-0.5', '3.0', '100.0']
+
+
+def test_times():
+    rng = np.random.default_rng(1)
+    column = np.concatenate([
+        [0.0, 59.999999, 3600.5, 86399.999999],
+        rng.uniform(0, 86400, 1000)])
+    expected = [
+        seconds_to_time(v).isoformat(timespec='microseconds') for v in column]
+    assert lines('time', column) == expected
+
+
+def test_ints_and_dates():
+    rng = np.random.default_rng(2)
+    ints = np.concatenate([
+        [0, 1, -1, 9, 10, -10, 2 ** 62],
+        rng.integers(-10 ** 12, 10 ** 12, 1000)])
+    assert lines('int', ints) == [str(v) for v in ints.tolist()]
+    dates = np.array([1, date(2025, 1, 31).toordinal(), date(9999, 12, 31).toordinal()])
+    assert lines('date', dates) == [date.fromordinal(v).isoformat() for v in dates.tolist()]
+
+
+def test_row_join():
+    times = np.array([1.25, 45296.0])
+    values = np.array([-0.0, 2.5])
+    n = len(times)
+    parts = [
+        *text_parts('int', np.array([7, -12])), _const(b',', n),
+        *text_parts('time', times), _const(b',', n),
+        *text_parts('float', values), _const(b'\n', n)]
+    assert join_text(parts).tobytes() == (
+        b'7,00:00:01.250000,-0.0\n-12,12:34:56.000000,2.5\n')
@@ -1,3 +1,4 @@
 # from .combobox import Combobox
 from .logwidget import LogWidget
+from .metricswidget import MetricsWidget
 from .wraplayout import WrapLayout
\ No newline at end of file
@@ -1,8 +1,20 @@
+from queue import SimpleQueue, Empty
+from logging.handlers import RotatingFileHandler
 from PySide6.QtWidgets import QApplication, QPlainTextEdit
+from PySide6.QtCore import QTimer
 import logging
 
 class LogWidget(QPlainTextEdit, logging.StreamHandler):
-    def __init__(self, parent=None, log_format=None, level=None):
+    """Журнал в виджете.
+
+    Записи из любого потока складываются в очередь, а в виджет выводятся
+    из GUI-потока пачками раз в interval мс с одной прокруткой на пачку.
+    Хранится не больше max_lines строк; полную историю можно писать в
+    файл spill с ротацией по spill_bytes.
+    """
+    def __init__(
+            self, parent=None, log_format=None, level=None, interval=100,
+            max_lines=10_000, spill=None, spill_bytes=10_000_000, spill_backups=5):
         super().__init__(parent)
         logging.StreamHandler.__init__(self)
         if log_format is None:
@@ -10,13 +22,46 @@ class LogWidget(QPlainTextEdit, logging.StreamHandler):
         if level is None:
             level = logging.WARNING
         self.setReadOnly(1)
+        self.setMaximumBlockCount(max_lines)
         formatter = logging.Formatter(log_format)
         self.setFormatter(formatter)
         self.setLevel(level)
+        self._queue = SimpleQueue()
+        self._spill = None
+        if spill:
+            self._spill = RotatingFileHandler(
+                spill, maxBytes=spill_bytes, backupCount=spill_backups,
+                encoding='utf-8')
+            self._spill.setFormatter(formatter)
+        self._timer = QTimer(self, interval=interval, timeout=self.__append)
+        self._timer.start()
 
     def emit(self, record):
-        log_msg = self.format(record)
-        self.appendPlainText(log_msg)
+        self._queue.put(self.format(record))
+        if self._spill is not None:
+            self._spill.emit(record)
+
+    def close(self):
+        # QWidget.close перекрывает Handler.close, а logging вызывает его
+        # при завершении, когда виджет уже может быть удалён
+        if self._spill is not None:
+            self._spill.close()
+        try:
+            return super().close()
+        except RuntimeError:
+            return False
+
+    def __append(self):
+        batch = []
+        try:
+            while True:
+                batch.append(self._queue.get_nowait())
+        except Empty:
+            pass
+        if not batch:
+            return
+        # старше max_lines строки всё равно будут вытеснены
+        self.appendPlainText('\n'.join(batch[-self.maximumBlockCount():]))
         self.__scrollDown()
 
     def __scrollDown(self):
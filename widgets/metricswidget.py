@@ -0,0 +1,66 @@
+import os
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox,
+    QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog
+)
+from PySide6.QtCore import QTimer
+
+import metrics
+
+HEADERS = ['Участок', 'Вызовов', 'p50, мс', 'p95, мс', 'Макс, мс', 'Всего, с']
+
+
+class MetricsWidget(QWidget):
+    """Сводка замеров metrics, обновляется раз в interval мс, пока видна"""
+    def __init__(self, parent=None, interval=1000):
+        super().__init__(parent)
+        self.enabled_box = QCheckBox(
+            "Замерять", checked=metrics.enabled(), toggled=metrics.enable)
+        reset_button = QPushButton("Сбросить", clicked=self.reset)
+        save_button = QPushButton("Сохранить JSON", clicked=self.save)
+        self.table = QTableWidget(0, len(HEADERS))
+        self.table.setHorizontalHeaderLabels(HEADERS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+
+        btns_layout = QHBoxLayout()
+        btns_layout.addWidget(self.enabled_box)
+        btns_layout.addStretch()
+        btns_layout.addWidget(reset_button)
+        btns_layout.addWidget(save_button)
+        layout = QVBoxLayout(self)
+        layout.addLayout(btns_layout)
+        layout.addWidget(self.table)
+
+        self._timer = QTimer(self, interval=interval, timeout=self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        summary = metrics.snapshot()
+        self.table.setRowCount(len(summary))
+        for row, (name, s) in enumerate(summary.items()):
+            values = [
+                name, str(s['count']), f"{s['p50'] * 1e3:.3f}",
+                f"{s['p95'] * 1e3:.3f}", f"{s['max'] * 1e3:.3f}",
+                f"{s['total']:.3f}"]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+
+    def reset(self):
+        metrics.reset()
+        self.refresh()
+
+    def save(self):
+        path, ok = QFileDialog.getSaveFileName(
+            self, 'Сохранение метрик', os.getenv('HOME'), 'JSON (*.json)')
+        if ok and path:
+            metrics.dump(path)
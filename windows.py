@@ -6,14 +6,18 @@ from PySide6.QtCore import Qt, Signal
 
 
 class MeasureWindow(QWidget):
-    def __init__(self, sig):
+    def __init__(self, sig, continuous_sig=None):
         super().__init__()
         self.sig = sig
+        self.continuous_sig = continuous_sig
         self.setWindowTitle("Измерения")
         self.setGeometry(400, 100, 100, 50)
 
         # Buttons
         run_button = QPushButton("Снять показания", clicked=self.send_params)
+        continuous_button = QPushButton(
+            "Непрерывно", clicked=self.send_continuous,
+            visible=continuous_sig is not None)
         close_button = QPushButton("Закрыть", clicked=self.close)
         
         # Edit fields
@@ -24,6 +28,9 @@ class MeasureWindow(QWidget):
         
         comment_line = QLineEdit()
         comment_line.setPlaceholderText("Комментарий")
+
+        rate_line = QLineEdit()
+        rate_line.setPlaceholderText("Частота, кадров/с (непрерывно)")
         
         # research_number = QLineEdit()
         # TODO set static field with current research number
@@ -32,6 +39,7 @@ class MeasureWindow(QWidget):
         # layout
         btn_layout = QHBoxLayout()
         btn_layout.addWidget(run_button)
+        btn_layout.addWidget(continuous_button)
         btn_layout.addWidget(close_button)
         
         layout = QVBoxLayout()
@@ -39,10 +47,22 @@ class MeasureWindow(QWidget):
         layout.addWidget(user_line)
         layout.addWidget(n_frames_line)
         layout.addWidget(comment_line)
+        layout.addWidget(rate_line)
         layout.addLayout(btn_layout)
         self.setLayout(layout)
     
     def send_params(self, *args):
+        username, n_frames, comment, _ = self.collect_params()
+        self.close()
+        self.sig.emit([username, n_frames, comment])
+
+    def send_continuous(self, *args):
+        username, _, comment, rate = self.collect_params()
+        self.close()
+        self.continuous_sig.emit([username, comment, rate])
+
+    def collect_params(self):
+        """Значения полей по порядку: ФИО, кадров, комментарий, частота"""
         layout = self.layout()
         params = []
         for i in range(layout.count()):
@@ -54,11 +74,9 @@ class MeasureWindow(QWidget):
             if v.isdigit():
                 v = int(v)
             elif v.replace('.', '', 1).replace(',', '', 1).isdigit():
-                v = float(v)
+                v = float(v.replace(',', '.'))
             params.append(v)
-        
-        self.close()
-        self.sig.emit(params)
+        return params
 
 
 # TODO filter